@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+def ranked_counts(series):
+    """Non-zero counts sorted by count (highest first), ties broken by value"""
+    series = series[series > 0]
+    # Plain object labels so counts from differently encoded frames can be added together
+    values = series.index.astype(object)
+    order = np.lexsort((values.astype(str), -series.values))
+    return pd.Series(series.values[order].astype('int64'), index=values[order], name=series.name)
+
+def merge_counts(counts, new_counts):
+    """Add two count series together, keeping the ranked order"""
+    return ranked_counts(counts.add(new_counts, fill_value=0))
+
+class DatasetAggregates:
+    """Counts behind the analytics pages, computed once per dataset version and additive over appends"""
+
+    def __init__(self, num_rows, word_counts, owner_counts, class_counts, year_counts, links_count,
+                 earliest_date, latest_date):
+        self.num_rows = num_rows
+        self.word_counts = word_counts
+        self.owner_counts = owner_counts
+        self.class_counts = class_counts
+        self.year_counts = year_counts
+        self.links_count = links_count
+        self.earliest_date = earliest_date
+        self.latest_date = latest_date
+        self._summary = None
+
+    @classmethod
+    def from_frame(cls, df):
+        """Aggregate a whole frame"""
+        def counts(column):
+            if column not in df.columns:
+                return pd.Series(dtype='int64')
+            return ranked_counts(df[column].value_counts(sort=False))
+
+        if 'Date_sort' in df.columns:
+            dates = df['Date_sort'].dropna()
+            years = dates.dt.year.value_counts(sort=False).sort_index().astype('int64')
+            earliest = dates.min() if len(dates) else None
+            latest = dates.max() if len(dates) else None
+        else:
+            years = pd.Series(dtype='int64')
+            earliest = latest = None
+
+        return cls(
+            num_rows=len(df),
+            word_counts=counts('Word'),
+            owner_counts=counts('Owner'),
+            class_counts=counts('Classes'),
+            year_counts=years,
+            links_count=int(df['Link'].notna().sum()) if 'Link' in df.columns else 0,
+            earliest_date=earliest,
+            latest_date=latest
+        )
+
+    def merged_with(self, new_rows):
+        """Aggregates after appending new_rows, without rescanning the existing data"""
+        delta = DatasetAggregates.from_frame(new_rows)
+        dates = [d for d in (self.earliest_date, self.latest_date, delta.earliest_date, delta.latest_date)
+                 if d is not None]
+        return DatasetAggregates(
+            num_rows=self.num_rows + delta.num_rows,
+            word_counts=merge_counts(self.word_counts, delta.word_counts),
+            owner_counts=merge_counts(self.owner_counts, delta.owner_counts),
+            class_counts=merge_counts(self.class_counts, delta.class_counts),
+            year_counts=self.year_counts.add(delta.year_counts, fill_value=0).sort_index().astype('int64'),
+            links_count=self.links_count + delta.links_count,
+            earliest_date=min(dates) if dates else None,
+            latest_date=max(dates) if dates else None
+        )
+
+    def data_stats(self):
+        """Basic statistics about the data"""
+        return {
+            'total_records': self.num_rows,
+            'unique_words': len(self.word_counts),
+            'unique_owners': len(self.owner_counts),
+            'links_count': self.links_count,
+            'unique_classes': len(self.class_counts)
+        }
+
+    def summary_stats(self):
+        """Data statistics plus owner, class and date summaries (built on first use)"""
+        if self._summary is None:
+            stats = self.data_stats()
+            if len(self.owner_counts):
+                stats['avg_trademarks_per_owner'] = self.owner_counts.mean()
+                stats['median_trademarks_per_owner'] = self.owner_counts.median()
+            if len(self.class_counts):
+                stats['most_active_class'] = self.class_counts.index[0]
+            if self.earliest_date is not None:
+                stats['earliest_date'] = self.earliest_date.strftime('%Y-%m-%d')
+                stats['latest_date'] = self.latest_date.strftime('%Y-%m-%d')
+            self._summary = stats
+        return self._summary
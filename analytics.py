@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 
 class TrademarkAnalytics:
     """Handles analytics calculations for trademark data"""
@@ -8,83 +9,90 @@ class TrademarkAnalytics:
     
     def get_top_owners(self, limit=10):
         """Get top trademark owners by count"""
-        df = self.data_loader.df
-        if 'Owner' not in df.columns:
-            return {}
-        return df['Owner'].value_counts().head(limit).to_dict()
+        return self.data_loader.aggregates.owner_counts.head(limit).to_dict()
     
     def get_top_classes(self, limit=10):
         """Get top classes by count"""
-        df = self.data_loader.df
-        if 'Classes' not in df.columns:
-            return {}
-        return df['Classes'].value_counts().head(limit).to_dict()
+        return self.data_loader.aggregates.class_counts.head(limit).to_dict()
     
     def get_class_distribution(self):
         """Get distribution of trademark classes"""
-        df = self.data_loader.df
-        if 'Classes' not in df.columns:
+        # Multiple classes per record are already exploded into the owner-class table
+        counts = self.data_loader.class_table.groupby('class_int').size()
+        counts = counts.iloc[np.lexsort((counts.index.values, -counts.values))]
+        return {str(number): int(count) for number, count in counts.items()}
+    
+    def get_owner_class_mix(self, owner_name, limit=None):
+        """Get the classes an owner registers marks in, most common first"""
+        table = self.data_loader.class_table
+        if 'owner_code' not in table.columns:
+            return {}
+        owner_names = self.data_loader.owner_names()
+        if owner_name not in owner_names:
+            return {}
+        
+        owner_code = owner_names.get_loc(owner_name)
+        counts = table.loc[table['owner_code'].values == owner_code, 'class_int'].value_counts()
+        counts = counts.iloc[np.lexsort((counts.index.values, -counts.values))]
+        if limit:
+            counts = counts.head(limit)
+        return {str(number): int(count) for number, count in counts.items()}
+    
+    def get_class_trends(self):
+        """Get yearly registration counts for each class"""
+        key = ('class_trends', self.data_loader.dataset_version)
+        return self.data_loader.result_cache.get_or_compute(key, self._compute_class_trends)
+    
+    def _compute_class_trends(self):
+        """Compute class-by-year counts over the current data"""
+        table = self.data_loader.class_table
+        if 'date' not in table.columns:
             return {}
         
-        # Handle multiple classes per record (comma-separated)
-        all_classes = []
-        for classes_str in df['Classes'].dropna():
-            if isinstance(classes_str, str):
-                # Split by comma and clean
-                classes = [cls.strip() for cls in classes_str.split(',')]
-                all_classes.extend(classes)
+        dated = table[table['date'].notna()]
+        counts = dated.groupby([dated['class_int'].values, dated['date'].dt.year.values]).size()
+        trends = {}
+        for (number, year), count in counts.items():
+            trends.setdefault(str(number), {})[int(year)] = int(count)
+        return trends
+    
+    def get_class_cooccurrence(self, limit=20):
+        """Get the class pairs most often registered together on one mark"""
+        class_index = self.data_loader.search_index.classes
+        if class_index is None:
+            return []
         
-        return pd.Series(all_classes).value_counts().to_dict()
+        matrix = class_index.cooccurrence()
+        first, second = np.triu_indices(len(matrix), k=1)
+        counts = matrix[first, second]
+        top = np.argsort(-counts, kind='stable')[:limit]
+        return [
+            {'classes': [int(first[i]), int(second[i])], 'count': int(counts[i])}
+            for i in top if counts[i] > 0
+        ]
     
     def get_owner_distribution(self):
         """Get distribution of trademarks by owner"""
-        df = self.data_loader.df
-        if 'Owner' not in df.columns:
-            return {}
-        return df['Owner'].value_counts().to_dict()
+        return self.data_loader.aggregates.owner_counts.to_dict()
     
     def get_temporal_trends(self):
         """Get temporal trends in trademark registrations"""
-        df = self.data_loader.df
-        if 'Date_sort' not in df.columns:
-            return {}
-        
-        # Group by year
-        df_with_dates = df.dropna(subset=['Date_sort'])
-        df_with_dates['Year'] = df_with_dates['Date_sort'].dt.year
-        yearly_counts = df_with_dates['Year'].value_counts().sort_index()
-        
-        return yearly_counts.to_dict()
+        return self.data_loader.aggregates.year_counts.to_dict()
     
     def get_summary_stats(self):
         """Get comprehensive summary statistics"""
-        stats = self.data_loader.get_data_stats()
-        
-        # Add additional analytics
-        df = self.data_loader.df
-        
-        # Average trademarks per owner
-        if 'Owner' in df.columns:
-            owner_counts = df['Owner'].value_counts()
-            stats['avg_trademarks_per_owner'] = owner_counts.mean()
-            stats['median_trademarks_per_owner'] = owner_counts.median()
-        
-        # Most active class
-        if 'Classes' in df.columns:
-            top_class = df['Classes'].value_counts().index[0] if len(df) > 0 else None
-            stats['most_active_class'] = top_class
-        
-        # Date range
-        if 'Date_sort' in df.columns:
-            valid_dates = df['Date_sort'].dropna()
-            if len(valid_dates) > 0:
-                stats['earliest_date'] = valid_dates.min().strftime('%Y-%m-%d')
-                stats['latest_date'] = valid_dates.max().strftime('%Y-%m-%d')
-        
-        return stats
+        # Materialized once per dataset version by the data loader
+        return dict(self.data_loader.aggregates.summary_stats())
     
     def search_analytics(self, query, field='all'):
         """Get analytics for search results"""
+        key = ('search_analytics', self.data_loader.dataset_version, query, field)
+        return dict(self.data_loader.result_cache.get_or_compute(
+            key, lambda: self._compute_search_analytics(query, field)
+        ))
+    
+    def _compute_search_analytics(self, query, field):
+        """Compute analytics for search results over the current data"""
         search_results = self.data_loader.search_data(query, field, limit=10000)
         
         if not search_results['results']:
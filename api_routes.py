@@ -1,16 +1,61 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, send_file
 import io
 import re
 import pandas as pd
+from exporters import stream_csv, export_format
+from stock_jobs import StockJobManager
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+def stock_summary(results_df):
+    """Summary figures for a stock analysis result table"""
+    if results_df.empty:
+        return {
+            'total_companies': 0, 
+            'public_companies': 0, 
+            'total_trademarks': 0, 
+            'total_market_cap': '0', 
+            'top_sector': 'N/A'
+        }
+    
+    public_companies = results_df[results_df['ticker'].notna()]
+    
+    # Handle market cap calculation safely
+    valid_market_caps = public_companies['market_cap'].dropna()
+    total_market_cap = valid_market_caps.sum() if len(valid_market_caps) > 0 else 0
+    
+    if total_market_cap > 1e12:
+        market_cap_str = f"{total_market_cap/1e12:.1f}T"
+    elif total_market_cap > 1e9:
+        market_cap_str = f"{total_market_cap/1e9:.1f}B"
+    elif total_market_cap > 1e6:
+        market_cap_str = f"{total_market_cap/1e6:.1f}M"
+    else:
+        market_cap_str = f"{total_market_cap:.0f}"
+    
+    # Handle top sector safely
+    valid_sectors = public_companies['sector'].dropna()
+    if len(valid_sectors) > 0:
+        top_sector = valid_sectors.mode().iloc[0] if not valid_sectors.empty else "N/A"
+    else:
+        top_sector = "N/A"
+    
+    return {
+        'total_companies': int(len(results_df)),
+        'public_companies': int(len(public_companies)),
+        'total_trademarks': int(results_df['trademark_count'].sum()),
+        'total_market_cap': market_cap_str,
+        'top_sector': top_sector
+    }
+
 class APIRoutes:
     """Handles API endpoints"""
     
     def __init__(self, data_loader, stock_matcher):
         self.data_loader = data_loader
         self.stock_matcher = stock_matcher
+        self.stock_jobs = StockJobManager(stock_matcher, data_loader,
+                                          lambda rows: stock_summary(pd.DataFrame(rows)))
     
     def search(self):
         """Search API endpoint"""
@@ -18,13 +63,80 @@ class APIRoutes:
         field = request.args.get('field', 'all')
         sort_by = request.args.get('sort_by', '')
         sort_order = request.args.get('sort_order', 'asc')
+        match = request.args.get('match', 'contains')
+        cursor = request.args.get('cursor') or None
+        
+        try:
+            config = self.data_loader.config
+            limit = int(request.args.get('limit', config.DEFAULT_SEARCH_LIMIT))
+            limit = max(1, min(limit, config.MAX_SEARCH_LIMIT))
+            offset = int(request.args.get('offset', 0))
+            classes = [int(c) for c in request.args.get('classes', '').split(',') if c.strip()]
+            class_match = request.args.get('class_match', 'any')
+            
+            result = self.data_loader.search_data(query, field, sort_by, sort_order, limit,
+                                                  match=match, offset=offset, cursor=cursor,
+                                                  classes=classes, class_match=class_match)
+            return jsonify(result)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    def owner_trademarks(self, owner_name):
+        """Paginated owner trademarks API endpoint"""
+        import urllib.parse
         
         try:
-            result = self.data_loader.search_data(query, field, sort_by, sort_order)
+            decoded_owner = urllib.parse.unquote(owner_name)
+            max_limit = self.data_loader.config.MAX_SEARCH_LIMIT
+            limit = min(int(request.args.get('limit', self.data_loader.config.OWNER_PAGE_SIZE)), max_limit)
+            offset = int(request.args.get('offset', 0))
+            
+            result = self.data_loader.get_owner_page(decoded_owner, offset, limit)
+            if result['total'] == 0:
+                return jsonify({'error': 'No trademarks found for this owner'}), 404
             return jsonify(result)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    def suggest(self):
+        """Typeahead suggestions API endpoint"""
+        query = request.args.get('query', '')
+        field = request.args.get('field', 'all')
+        
+        try:
+            config = self.data_loader.config
+            limit = int(request.args.get('limit', config.DEFAULT_SUGGEST_LIMIT))
+            limit = max(1, min(limit, config.MAX_SEARCH_LIMIT))
+            return jsonify(self.data_loader.suggest(query, field, limit))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    def similar(self):
+        """Similar marks API endpoint (near spellings and sound-alikes)"""
+        query = request.args.get('query', '')
+        
+        try:
+            config = self.data_loader.config
+            limit = int(request.args.get('limit', config.DEFAULT_SIMILAR_LIMIT))
+            limit = max(1, min(limit, config.MAX_SEARCH_LIMIT))
+            max_distance = int(request.args.get('max_distance', 2))
+            min_score = float(request.args.get('min_score', 70))
+            return jsonify(self.data_loader.find_similar_marks(query, limit, max_distance, min_score))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    def cache_stats(self):
+        """Result cache statistics API endpoint"""
+        return jsonify(self.data_loader.get_cache_stats())
+    
     def class_guide(self):
         """Class guide API endpoint"""
         try:
@@ -61,19 +173,55 @@ class APIRoutes:
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    def export(self):
+        """Export the rows matching a search (or every row) as CSV, NDJSON, Arrow or Parquet"""
+        query = request.args.get('query', '').strip()
+        field = request.args.get('field', 'all')
+        sort_by = request.args.get('sort_by', '')
+        sort_order = request.args.get('sort_order', 'asc')
+        match = request.args.get('match', 'contains')
+        
+        try:
+            encoder, mimetype, extension = export_format(request.args.get('format', 'parquet'))
+            classes = [int(c) for c in request.args.get('classes', '').split(',') if c.strip()]
+            class_match = request.args.get('class_match', 'any')
+            state = self.data_loader.current_state()
+            rows = self.data_loader.search_rows(query, field, sort_by, sort_order, match,
+                                                classes=classes, class_match=class_match, state=state)
+            
+            # Column projection, in the requested order
+            df = state.df
+            output_columns = [col for col in df.columns if col != 'Date_sort']
+            columns = [col.strip() for col in request.args.get('columns', '').split(',') if col.strip()]
+            unknown = [col for col in columns if col not in output_columns]
+            if unknown:
+                raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+            
+            subset = df.iloc[rows]
+            if columns:
+                subset = subset[columns]
+            
+            return Response(
+                encoder(self.data_loader.iter_output_chunks(subset, link_prefix=state.link_prefix)),
+                mimetype=mimetype,
+                headers={
+                    'Content-Disposition': f'attachment; filename=trademark_export.{extension}',
+                    'X-Total-Count': str(len(rows))
+                }
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
     def export_csv(self):
         """Export main data as CSV"""
         try:
             df = self.data_loader.df
-            output = io.StringIO()
-            
-            # Remove sorting column if it exists
-            export_df = df.drop('Date_sort', axis=1) if 'Date_sort' in df.columns else df
-            export_df.to_csv(output, index=False)
-            output.seek(0)
             
+            # Stream in row chunks (sorting column removed, full links restored per chunk)
             return Response(
-                output.getvalue(),
+                stream_csv(self.data_loader.iter_output_chunks(df)),
                 mimetype='text/csv',
                 headers={'Content-Disposition': 'attachment; filename=trademark_data.csv'}
             )
@@ -83,22 +231,14 @@ class APIRoutes:
     def export_excel(self):
         """Export main data as Excel"""
         try:
-            import pandas as pd
-            
-            df = self.data_loader.df
-            output = io.BytesIO()
-            
-            # Remove sorting column if it exists
-            export_df = df.drop('Date_sort', axis=1) if 'Date_sort' in df.columns else df
+            # Built once per dataset version, then served from disk
+            export_path = self.data_loader.get_excel_export()
             
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                export_df.to_excel(writer, sheet_name='Trademark Data', index=False)
-            output.seek(0)
-            
-            return Response(
-                output.getvalue(),
+            return send_file(
+                export_path,
                 mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                headers={'Content-Disposition': 'attachment; filename=trademark_data.xlsx'}
+                as_attachment=True,
+                download_name='trademark_data.xlsx'
             )
         except Exception as e:
             return jsonify({'error': str(e)}), 500
@@ -113,27 +253,17 @@ class APIRoutes:
             decoded_owner = urllib.parse.unquote(owner_name)
             
             # Get trademarks for this owner
-            owner_trademarks = self.data_loader.df[
-                self.data_loader.df['Owner'].str.contains(decoded_owner, case=False, na=False, regex=False)
-            ].copy()
+            owner_trademarks = self.data_loader.get_owner_trademarks(decoded_owner)
             
             if owner_trademarks.empty:
                 return jsonify({'error': 'No trademarks found for this owner'}), 404
             
-            # Remove sorting column if present
-            export_df = owner_trademarks.drop('Date_sort', axis=1) if 'Date_sort' in owner_trademarks.columns else owner_trademarks
-            
-            # Create CSV
-            output = io.StringIO()
-            export_df.to_csv(output, index=False)
-            output.seek(0)
-            
             # Safe filename
             safe_filename = re.sub(r'[^\w\s-]', '', decoded_owner).strip()[:50]
             filename = f"trademarks_{safe_filename}.csv"
             
             return Response(
-                output.getvalue(),
+                stream_csv(self.data_loader.iter_output_chunks(owner_trademarks)),
                 mimetype='text/csv',
                 headers={'Content-Disposition': f'attachment; filename={filename}'}
             )
@@ -151,51 +281,10 @@ class APIRoutes:
             
             if results_df.empty:
                 print("No results found")
-                return jsonify({
-                    'results': [], 
-                    'summary': {
-                        'total_companies': 0, 
-                        'public_companies': 0, 
-                        'total_trademarks': 0, 
-                        'total_market_cap': '0', 
-                        'top_sector': 'N/A'
-                    }
-                })
+                return jsonify({'results': [], 'summary': stock_summary(results_df)})
             
             print(f"Analysis complete. Results shape: {results_df.shape}")
-            
-            # Calculate summary statistics
-            public_companies = results_df[results_df['ticker'].notna()]
-            print(f"Found {len(public_companies)} public companies out of {len(results_df)} total")
-            
-            # Handle market cap calculation safely
-            valid_market_caps = public_companies['market_cap'].dropna()
-            total_market_cap = valid_market_caps.sum() if len(valid_market_caps) > 0 else 0
-            
-            if total_market_cap > 1e12:
-                market_cap_str = f"{total_market_cap/1e12:.1f}T"
-            elif total_market_cap > 1e9:
-                market_cap_str = f"{total_market_cap/1e9:.1f}B"
-            elif total_market_cap > 1e6:
-                market_cap_str = f"{total_market_cap/1e6:.1f}M"
-            else:
-                market_cap_str = f"{total_market_cap:.0f}"
-            
-            # Handle top sector safely
-            valid_sectors = public_companies['sector'].dropna()
-            if len(valid_sectors) > 0:
-                top_sector = valid_sectors.mode().iloc[0] if not valid_sectors.empty else "N/A"
-            else:
-                top_sector = "N/A"
-            
-            summary = {
-                'total_companies': int(len(results_df)),
-                'public_companies': int(len(public_companies)),
-                'total_trademarks': int(results_df['trademark_count'].sum()),
-                'total_market_cap': market_cap_str,
-                'top_sector': top_sector
-            }
-            
+            summary = stock_summary(results_df)
             print(f"Summary: {summary}")
             
             # Convert DataFrame to dict, handling NaN values
@@ -210,4 +299,55 @@ class APIRoutes:
             print(f"Error in stock analysis: {str(e)}")
             import traceback
             traceback.print_exc()
-            return jsonify({'error': str(e)}), 500
\ No newline at end of file
+            return jsonify({'error': str(e)}), 500
+    
+    def start_stock_job(self):
+        """Start a background stock analysis (an identical running job is shared)"""
+        try:
+            payload = request.get_json(silent=True) or {}
+            limit = int(payload.get('limit', request.args.get('limit', 100)))
+            if limit < 1:
+                raise ValueError("limit must be at least 1")
+            
+            job, created = self.stock_jobs.start(limit)
+            status = job.to_dict()
+            status['deduplicated'] = not created
+            status['status_url'] = f"/api/analyze-stocks/jobs/{job.id}"
+            status['events_url'] = f"/api/analyze-stocks/jobs/{job.id}/events"
+            return jsonify(status), 202 if created else 200
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    def stock_job_status(self, job_id):
+        """Poll a stock analysis job (results are included once it is done)"""
+        job = self.stock_jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': f"Unknown job '{job_id}'"}), 404
+        include_results = job.status == 'done' or request.args.get('results') == '1'
+        return jsonify(job.to_dict(include_results=include_results))
+    
+    def stock_job_events(self, job_id):
+        """Stream a job's result rows as Server-Sent Events (resumable with Last-Event-ID)"""
+        job = self.stock_jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': f"Unknown job '{job_id}'"}), 404
+        try:
+            last_event_id = request.headers.get('Last-Event-ID', request.args.get('from'))
+            start = int(last_event_id) + 1 if last_event_id is not None else 0
+        except ValueError:
+            return jsonify({'error': 'Last-Event-ID must be a row number'}), 400
+        
+        return Response(
+            job.events(start),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    def cancel_stock_job(self, job_id):
+        """Cancel a running stock analysis job"""
+        job = self.stock_jobs.cancel(job_id)
+        if job is None:
+            return jsonify({'error': f"Unknown job '{job_id}'"}), 404
+        return jsonify(job.to_dict())
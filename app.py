@@ -5,7 +5,7 @@ Trademark Data Explorer - Main Application
 A modular Flask application for exploring and analyzing trademark data.
 """
 
-from flask import Flask
+from flask import Flask, request
 from pathlib import Path
 
 # Import configuration and components (UPDATED FOR FLAT STRUCTURE)
@@ -87,12 +87,34 @@ class TrademarkExplorerApp:
         
         # API routes
         self.app.route('/api/search')(self.api_routes.search)
+        self.app.route('/api/suggest')(self.api_routes.suggest)
+        self.app.route('/api/similar')(self.api_routes.similar)
+        self.app.route('/api/cache-stats')(self.api_routes.cache_stats)
         self.app.route('/api/class-guide')(self.api_routes.class_guide)
         self.app.route('/api/class-guide/download')(self.api_routes.download_class_guide)
+        self.app.route('/api/export')(self.api_routes.export)
         self.app.route('/api/export/csv')(self.api_routes.export_csv)
         self.app.route('/api/export/excel')(self.api_routes.export_excel)
         self.app.route('/api/analyze-stocks')(self.api_routes.analyze_stocks)
         
+        # Owner trademarks, one page at a time
+        @self.app.route('/api/owner/<path:owner_name>')
+        def owner_trademarks_route(owner_name):
+            return self.api_routes.owner_trademarks(owner_name)
+        
+        # Background stock analysis jobs
+        self.app.route('/api/analyze-stocks/jobs', methods=['POST'])(self.api_routes.start_stock_job)
+        
+        @self.app.route('/api/analyze-stocks/jobs/<job_id>', methods=['GET', 'DELETE'])
+        def stock_job_route(job_id):
+            if request.method == 'DELETE':
+                return self.api_routes.cancel_stock_job(job_id)
+            return self.api_routes.stock_job_status(job_id)
+        
+        @self.app.route('/api/analyze-stocks/jobs/<job_id>/events')
+        def stock_job_events_route(job_id):
+            return self.api_routes.stock_job_events(job_id)
+        
         # NEW API ROUTE: Export owner-specific data - with proper method reference
         @self.app.route('/api/export/owner/<path:owner_name>')
         def export_owner_route(owner_name):
@@ -129,6 +151,7 @@ class TrademarkExplorerApp:
                 'cache_path': str(self.config.stock_cache_path)
             },
             'data': self.data_loader.get_data_stats(),
+            'result_cache': self.data_loader.get_cache_stats(),
             'stock_mappings': len(self.stock_matcher.manual_mappings),
             'blacklisted_companies': len(self.stock_matcher.company_blacklist)
         }
@@ -149,6 +172,9 @@ def main():
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
     parser.add_argument('--data-path', help='Path to data directory')
     parser.add_argument('--stats', action='store_true', help='Show app statistics and exit')
+    parser.add_argument('--memory-report', action='store_true', help='Show data memory usage and exit')
+    parser.add_argument('--matching-report', action='store_true',
+                        help='Compare blocked and brute-force ticker matching on the top owners and exit')
     
     args = parser.parse_args()
     
@@ -173,6 +199,34 @@ def main():
             print(f"Blacklisted terms: {stats['blacklisted_companies']:,}")
             return
         
+        if args.memory_report:
+            # Show memory usage before and after compaction and exit
+            report = app.data_loader.get_memory_report()
+            print("\n💾 Data Memory Report:")
+            print("=" * 50)
+            print(f"{'Column':<12}{'Before (MB)':>14}{'After (MB)':>14}")
+            for col, usage in report['columns'].items():
+                print(f"{col:<12}{usage['before'] / 1e6:>14.1f}{usage['after'] / 1e6:>14.1f}")
+            print(f"{'Total':<12}{report['total_before'] / 1e6:>14.1f}{report['total_after'] / 1e6:>14.1f}")
+            if report['link_prefix']:
+                print(f"Shared link prefix: {report['link_prefix']}")
+            return
+        
+        if args.matching_report:
+            # Show how much of brute-force fuzzy matching the blocking index recalls and exit
+            owners = app.data_loader.df['Owner'].value_counts()
+            owners = owners[owners > 0].head(app.config.DEFAULT_STOCK_ANALYSIS_LIMIT)
+            report = app.stock_matcher.blocking_recall_report(list(owners.index))
+            print("\n🔎 Ticker Matching Blocking Report:")
+            print("=" * 50)
+            print(f"Owners checked: {report['owners']:,} ({report['fuzzy_scored']:,} needed fuzzy scoring)")
+            print(f"Mapping keys: {report['mapping_keys']:,}, avg candidates per owner: {report['avg_candidates']:.1f}")
+            print(f"Brute-force matches: {report['brute_force_matches']:,}, recalled: {report['recalled_matches']:,} "
+                  f"({report['recall'] * 100:.2f}%)")
+            print(f"Same ticker: {report['same_ticker']:,} of {report['owners']:,}")
+            print(f"Brute force: {report['brute_force_seconds']:.2f}s, blocked: {report['blocked_seconds']:.2f}s")
+            return
+        
         # Run the application
         app.run(debug=args.debug, host=args.host, port=args.port)
         
@@ -0,0 +1,71 @@
+import numpy as np
+
+# Tokens this short are too common to block on (and do not count as word overlap either)
+MIN_TOKEN_LENGTH = 3
+
+# Character n-gram size used for misspelled or run-together names
+NGRAM_SIZE = 3
+
+# A key sharing this fraction of the query's n-grams is a candidate even without a shared token
+MIN_NGRAM_SHARE = 0.25
+
+# Most candidates scored per query, best n-gram overlap first
+MAX_CANDIDATES = 64
+
+def blocking_features(text):
+    """Significant tokens and word-boundary character n-grams of a normalized name"""
+    tokens = [token for token in text.split() if len(token) >= MIN_TOKEN_LENGTH]
+    ngrams = set()
+    for token in text.split():
+        padded = f" {token} "
+        ngrams.update(padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1))
+    return set(tokens), ngrams
+
+class CandidateIndex:
+    """Inverted token and n-gram index over mapping keys, so fuzzy matching scores only likely keys"""
+
+    def __init__(self, keys):
+        self.num_keys = len(keys)
+        self._token_ids = {}
+        self._ngram_ids = {}
+        token_pairs, ngram_pairs = [], []
+        for key_id, key in enumerate(keys):
+            tokens, ngrams = blocking_features(key)
+            for token in tokens:
+                token_pairs.append((self._token_ids.setdefault(token, len(self._token_ids)), key_id))
+            for ngram in ngrams:
+                ngram_pairs.append((self._ngram_ids.setdefault(ngram, len(self._ngram_ids)), key_id))
+
+        self._token_offsets, self._token_keys = self._postings(token_pairs, len(self._token_ids))
+        self._ngram_offsets, self._ngram_keys = self._postings(ngram_pairs, len(self._ngram_ids))
+
+    @staticmethod
+    def _postings(pairs, num_features):
+        """Keys of feature f are keys[offsets[f]:offsets[f + 1]], in key order"""
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+        counts = np.bincount(pairs[order, 0], minlength=num_features)
+        return np.concatenate(([0], np.cumsum(counts))), pairs[order, 1].astype(np.int32)
+
+    def _gather(self, feature_ids, offsets, keys):
+        if not feature_ids:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([keys[offsets[f]:offsets[f + 1]] for f in feature_ids])
+
+    def candidates(self, query):
+        """Sorted ids of keys sharing a significant token or enough n-grams with the query"""
+        tokens, ngrams = blocking_features(query)
+        token_ids = [self._token_ids[t] for t in tokens if t in self._token_ids]
+        ngram_ids = [self._ngram_ids[g] for g in ngrams if g in self._ngram_ids]
+
+        key_ids, shared = np.unique(self._gather(ngram_ids, self._ngram_offsets, self._ngram_keys),
+                                    return_counts=True)
+        shares_token = np.zeros(self.num_keys, dtype=bool)
+        shares_token[self._gather(token_ids, self._token_offsets, self._token_keys)] = True
+        keep = (shared >= MIN_NGRAM_SHARE * max(len(ngrams), 1)) | shares_token[key_ids]
+        key_ids, shared = key_ids[keep], shared[keep]
+
+        if len(key_ids) > MAX_CANDIDATES:
+            top = np.argsort(-shared, kind='stable')[:MAX_CANDIDATES]
+            key_ids = key_ids[top]
+        return np.sort(key_ids)
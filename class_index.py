@@ -0,0 +1,80 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Nice classes run 1-45; each maps to one bit of a 64-bit mask
+MAX_NICE_CLASS = 45
+MAX_CLASS = 63
+
+CLASS_PATTERN = re.compile(r'\d+')
+
+BIT_POSITIONS = np.arange(MAX_CLASS + 1, dtype=np.uint64)
+
+def parse_classes(text):
+    """Class numbers in a comma-separated Classes value"""
+    return sorted({int(number) for number in CLASS_PATTERN.findall(str(text)) if 0 < int(number) <= MAX_CLASS})
+
+def classes_to_mask(classes):
+    """64-bit mask with one bit set per class number"""
+    mask = 0
+    for number in classes:
+        if 0 < number <= MAX_CLASS:
+            mask |= 1 << number
+    return mask
+
+class ClassIndex:
+    """Multi-hot Nice class masks, parsed once per distinct Classes value and shared by rows through codes"""
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series)
+        self.num_rows = len(codes)
+
+        # Missing values (code -1) point at a trailing all-zero mask
+        self.codes = np.where(codes >= 0, codes, len(uniques)).astype(np.int32)
+        self.value_masks = np.array(
+            [classes_to_mask(parse_classes(value)) for value in uniques] + [0],
+            dtype=np.uint64
+        )
+        self.value_bits = ((self.value_masks[:, None] >> BIT_POSITIONS) & np.uint64(1)).astype(bool)
+        self.value_counts = np.bincount(self.codes, minlength=len(self.value_masks))
+
+    def _value_weights(self, rows=None):
+        """Rows per distinct value, over all rows or the given row ids / mask"""
+        if rows is None:
+            return self.value_counts
+        return np.bincount(self.codes[rows], minlength=len(self.value_masks))
+
+    def match_mask(self, classes, require_all=False):
+        """Boolean row mask of marks in any (or all) of the classes"""
+        query = np.uint64(classes_to_mask(classes))
+        overlap = self.value_masks & query
+        value_match = overlap == query if require_all else overlap != 0
+        # Missing values never match, even for an empty class list
+        value_match[-1] = False
+        return value_match[self.codes]
+
+    def class_counts(self, rows=None):
+        """Number of marks registered in each class, most common first"""
+        counts = self._value_weights(rows) @ self.value_bits.astype(np.int64)
+        present = np.flatnonzero(counts)
+        order = present[np.lexsort((present, -counts[present]))]
+        return {int(number): int(counts[number]) for number in order}
+
+    def cooccurrence(self, rows=None):
+        """Matrix of how many marks share each pair of classes (diagonal holds class counts)"""
+        bits = self.value_bits.astype(np.int64)
+        return (bits * self._value_weights(rows)[:, None]).T @ bits
+
+    def explode(self):
+        """(row_id, class_number) pairs for every class of every row, as int32 arrays"""
+        # Classes of each distinct value laid out back to back, one span per value
+        value_ids, value_classes = np.nonzero(self.value_bits)
+        value_lengths = np.bincount(value_ids, minlength=len(self.value_masks))
+        value_starts = np.concatenate([[0], np.cumsum(value_lengths)[:-1]])
+
+        row_lengths = value_lengths[self.codes]
+        row_ids = np.repeat(np.arange(self.num_rows, dtype=np.int32), row_lengths)
+        row_starts = np.cumsum(row_lengths) - row_lengths
+        within = np.arange(len(row_ids)) - np.repeat(row_starts, row_lengths)
+        classes = value_classes[np.repeat(value_starts[self.codes], row_lengths) + within]
+        return row_ids, classes.astype(np.int32)
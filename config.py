@@ -17,6 +17,16 @@ class Config:
         """Path to the main CSV data file"""
         return self.base_path / "data" / "consolidated_table_with_links.csv"
     
+    @property
+    def snapshot_file_path(self):
+        """Path to the typed columnar snapshot of the main CSV data"""
+        return self.base_path / "data" / "consolidated_table_with_links.parquet"
+    
+    @property
+    def export_cache_dir(self):
+        """Directory for export files built once per dataset version"""
+        return self.base_path / "data" / "exports"
+    
     @property
     def classes_file_path(self):
         """Path to the IPO classes CSV file"""
@@ -24,7 +34,12 @@ class Config:
     
     @property
     def stock_cache_path(self):
-        """Path to the stock cache JSON file"""
+        """Path to the stock cache SQLite database"""
+        return self.base_path / "data" / "stock_cache.sqlite3"
+    
+    @property
+    def legacy_stock_cache_path(self):
+        """Path to the old stock cache JSON file, imported into the database once"""
         return self.base_path / "data" / "stock_cache.json"
     
     # Flask settings
@@ -34,8 +49,33 @@ class Config:
     
     # Data settings
     DEFAULT_SEARCH_LIMIT = 100
+    MAX_SEARCH_LIMIT = 1000
+    DEFAULT_SUGGEST_LIMIT = 10
+    DEFAULT_SIMILAR_LIMIT = 20
+    OWNER_PAGE_SIZE = 100
+    EXPORT_CHUNK_ROWS = 5000
+    RESULT_CACHE_SIZE = 256
+    ORDER_CACHE_SIZE = 64
+    ORDER_CACHE_MAX_MB = 64  # matched row and sort key arrays kept for paging, per worker
+    USE_DATA_SNAPSHOT = True
+    COMPACT_DATA_MODE = True
     DEFAULT_STOCK_ANALYSIS_LIMIT = 500
-    STOCK_CACHE_HOURS = 1
+    STOCK_QUOTE_TTL_MINUTES = 60  # price, market cap, P/E and yield are fresh this long
+    STOCK_QUOTE_STALE_HOURS = 24  # stale quotes are still served (and refreshed) up to this age
+    STOCK_PROFILE_TTL_HOURS = 24 * 7  # name, sector, industry, country and exchange
+    STOCK_INVALID_TTL_MINUTES = 30  # unknown tickers are not looked up again for this long
+    STOCK_REFRESH_INTERVAL_SECONDS = 300
+    STOCK_REFRESH_HOT_TICKERS = 100
+    STOCK_REFRESH_AHEAD = 0.8  # hot tickers are refreshed once this fraction of the quote TTL has passed
+    FUZZY_BLOCKING_MIN_KEYS = 5000
+    
+    # Market data settings ('yfinance', or 'stub' for canned quotes without network access)
+    MARKET_DATA_PROVIDER = "yfinance"
+    MARKET_DATA_WORKERS = 8
+    MARKET_DATA_RATE = 4.0
+    MARKET_DATA_BURST = 8
+    MARKET_DATA_RETRIES = 3
+    MARKET_DATA_BACKOFF = 0.5
     
     # UI settings
     MAX_DISPLAY_RESULTS = 100
@@ -1,8 +1,40 @@
 # File: data_loader.py (Updated for flat structure)
 import pandas as pd
+import numpy as np
+import base64
+import hashlib
+import json
 import os
+import threading
+from collections import namedtuple
 from pathlib import Path
 from sample_data import IPOClassGenerator  # Changed from .sample_data
+from search_index import SearchIndex
+from similarity import SimilarityIndex, MAX_EDIT_DISTANCE
+from result_cache import ResultCache
+from aggregates import DatasetAggregates
+from query_parser import parse_query, execute_query
+from class_index import MAX_NICE_CLASS
+from exporters import write_excel
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Snapshot cache is optional; fall back to parsing the CSV
+    pa = None
+    pq = None
+
+# Columns kept as strings regardless of what the CSV parser would infer
+TEXT_COLUMNS = ['Word', 'Classes', 'Owner', 'Link', 'Date']
+
+# Heavily repeated columns stored as categoricals in compact mode
+CATEGORICAL_COLUMNS = ['Word', 'Classes', 'Owner', 'Date']
+
+SNAPSHOT_METADATA_KEY = b'trademark_snapshot'
+SNAPSHOT_FORMAT_VERSION = 1
+
+# The frame and what is derived from it, read together so one request never mixes two datasets
+DataState = namedtuple('DataState', ['df', 'search_index', 'link_prefix', 'version'])
 
 class TrademarkDataLoader:
     """Handles loading and managing trademark data"""
@@ -11,30 +43,240 @@ class TrademarkDataLoader:
         self.config = config
         self._df = None
         self._classes_df = None
+        self._link_prefix = ''
+        self._memory_report = None
+        self._search_index = None
+        self._similarity_index = None
+        self._aggregates = None
+        self._class_table = None
+        self.dataset_version = None
+        self._export_lock = threading.Lock()
+        # Reloads and appends run one at a time; _state_lock covers publishing their result
+        self._update_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self.result_cache = ResultCache(config.RESULT_CACHE_SIZE)
+        # Ordered match and owner row arrays get their own byte-bounded cache so large matches cannot pile up
+        self.order_cache = ResultCache(config.ORDER_CACHE_SIZE, max_bytes=config.ORDER_CACHE_MAX_MB * 2**20,
+                                       sizeof=lambda arrays: sum({id(a): a.nbytes for a in arrays}.values()))
         
     def load_main_data(self):
-        """Load the main trademark CSV data"""
+        """Load the main trademark data, preferring an up-to-date snapshot over the CSV"""
         data_path = self.config.data_file_path
         
         if data_path.exists():
             print(f"✓ CSV file found at: {data_path}")
-            df = pd.read_csv(data_path)
+            df = None
+            source_info = self._get_source_info(data_path)
+            
+            if self.config.USE_DATA_SNAPSHOT:
+                df = self._load_snapshot(data_path, source_info)
             
-            # Process date column if it exists
-            if 'Date' in df.columns:
-                try:
-                    df['Date_sort'] = pd.to_datetime(df['Date'], format='%d %B %Y', errors='coerce')
-                    print("✓ Date column converted for proper sorting")
-                except Exception as e:
-                    print(f"⚠ Could not convert dates: {e}")
+            if df is None:
+                df = self._read_csv(data_path)
+                if self.config.USE_DATA_SNAPSHOT:
+                    self._write_snapshot(df, source_info)
                     
-            print(f"✓ CSV loaded successfully. Shape: {df.shape}")
-            self._df = df
-            return df
+            print(f"✓ Data loaded successfully. Shape: {df.shape}")
+            self._set_dataframe(df, self._source_version(source_info))
+            return self._df
         else:
             print(f"✗ CSV file NOT found at: {data_path}")
             return pd.DataFrame(columns=['Word', 'Classes', 'Owner', 'Link', 'Date'])
     
+    def reload_data(self):
+        """Reload the main data from disk, invalidating cached results"""
+        with self._update_lock:
+            return self.load_main_data()
+    
+    def append_data(self, new_rows):
+        """Append trademark rows to the loaded data, rebuilding indexes and invalidating caches"""
+        with self._update_lock:
+            return self._append_rows(new_rows.copy())
+    
+    def _append_rows(self, new_rows):
+        """append_data without the update lock"""
+        if 'Date' in new_rows.columns and 'Date_sort' not in new_rows.columns:
+            new_rows['Date_sort'] = pd.to_datetime(new_rows['Date'], format='%d %B %Y', errors='coerce')
+        
+        # Restore full links so the combined frame is compacted against one shared prefix
+        combined = pd.concat([self.expand_links(self.df), new_rows], ignore_index=True)
+        
+        # Chain the version so every worker appending the same rows agrees on it
+        digest = hashlib.sha256(str(self.dataset_version).encode())
+        digest.update(pd.util.hash_pandas_object(new_rows, index=False).values.tobytes())
+        
+        # Aggregates are additive, so only the new rows need counting
+        aggregates = self.aggregates.merged_with(new_rows)
+        
+        self._set_dataframe(combined, digest.hexdigest()[:16], aggregates)
+        print(f"✓ Appended {len(new_rows):,} rows. Shape: {combined.shape}")
+        return self._df
+    
+    def _source_version(self, source_info):
+        """Dataset version id for data loaded straight from the CSV"""
+        if source_info['sha256']:
+            return source_info['sha256'][:16]
+        return f"{source_info['mtime_ns']:x}-{source_info['size']:x}"
+    
+    def _set_dataframe(self, df, version, aggregates=None):
+        """Install a freshly loaded frame, compacting it if configured
+        
+        Everything derived from the frame is built first and published together with the version,
+        so requests never pair the new frame with old indexes or links without their prefix.
+        """
+        link_prefix = ''
+        memory_report = None
+        if self.config.COMPACT_DATA_MODE:
+            df, link_prefix, memory_report = self._compact_dataframe(df)
+        search_index = SearchIndex(df, link_prefix)
+        print("✓ Search index built")
+        similarity_index = SimilarityIndex(df['Word']) if 'Word' in df.columns else None
+        print("✓ Similarity index built")
+        if aggregates is None:
+            aggregates = DatasetAggregates.from_frame(df)
+        print("✓ Aggregates materialized")
+        class_table = self._build_class_table(df, search_index)
+        print("✓ Owner-class table built")
+        
+        with self._state_lock:
+            self._df = df
+            self._link_prefix = link_prefix
+            self._memory_report = memory_report
+            self._search_index = search_index
+            self._similarity_index = similarity_index
+            self._aggregates = aggregates
+            self._class_table = class_table
+            
+            # Results computed against the previous data must never be served again
+            self.dataset_version = version
+            self.result_cache.clear()
+            self.order_cache.clear()
+    
+    def _compact_dataframe(self, df):
+        """Dictionary-encode repetitive columns and strip the shared Link prefix
+        
+        Returns the compacted frame, the stripped prefix and a memory report.
+        """
+        link_prefix = ''
+        before = df.memory_usage(deep=True, index=False)
+        df = df.copy()
+        
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns and df[col].dtype == object:
+                df[col] = df[col].astype('category')
+        
+        if 'Link' in df.columns and df['Link'].dtype == object:
+            links = df['Link'].dropna()
+            if len(links) > 0:
+                # Common prefix of the lexical extremes is the common prefix of all links
+                prefix = os.path.commonprefix([links.min(), links.max()])
+                # Cut at a path boundary so newly added links are likely to share it
+                # and no search token straddles the prefix and the stored suffix
+                prefix = prefix[:prefix.rfind('/') + 1]
+                if prefix:
+                    df['Link'] = df['Link'].str.slice(len(prefix))
+                    link_prefix = prefix
+        
+        after = df.memory_usage(deep=True, index=False)
+        memory_report = {
+            'columns': {
+                col: {'before': int(before[col]), 'after': int(after[col])}
+                for col in df.columns
+            },
+            'total_before': int(before.sum()),
+            'total_after': int(after.sum()),
+            'link_prefix': link_prefix
+        }
+        print(f"✓ Compact mode: {before.sum() / 1e6:.1f} MB -> {after.sum() / 1e6:.1f} MB")
+        return df, link_prefix, memory_report
+    
+    def _read_csv(self, data_path):
+        """Parse the main CSV file with fixed dtypes and a parsed sort date"""
+        df = pd.read_csv(data_path, dtype={col: str for col in TEXT_COLUMNS})
+        
+        # Process date column if it exists
+        if 'Date' in df.columns:
+            try:
+                df['Date_sort'] = pd.to_datetime(df['Date'], format='%d %B %Y', errors='coerce')
+                print("✓ Date column converted for proper sorting")
+            except Exception as e:
+                print(f"⚠ Could not convert dates: {e}")
+        
+        print(f"✓ CSV loaded successfully. Shape: {df.shape}")
+        return df
+    
+    def _get_source_info(self, data_path):
+        """Describe the CSV file so a snapshot can be checked against it"""
+        stat = data_path.stat()
+        return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': None}
+    
+    def _hash_file(self, path):
+        """SHA-256 of a file's contents, read in blocks"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_snapshot(self, data_path, source_info):
+        """Load the columnar snapshot if it still matches the CSV, otherwise return None"""
+        snapshot_path = self.config.snapshot_file_path
+        if pq is None or not snapshot_path.exists():
+            return None
+        
+        try:
+            metadata = pq.read_schema(snapshot_path).metadata or {}
+            stored = json.loads(metadata.get(SNAPSHOT_METADATA_KEY, b'{}'))
+            if stored.get('version') != SNAPSHOT_FORMAT_VERSION:
+                print("⚠ Snapshot format changed, rebuilding")
+                return None
+            
+            # The mtime/size check is cheap; only hash the CSV when it looks modified
+            if stored.get('mtime_ns') != source_info['mtime_ns'] or stored.get('size') != source_info['size']:
+                source_info['sha256'] = self._hash_file(data_path)
+                if stored.get('sha256') != source_info['sha256']:
+                    print("⚠ CSV changed since the snapshot was written, rebuilding")
+                    return None
+                
+                df = pq.read_table(snapshot_path).to_pandas()
+                # Contents are unchanged, so refresh the stored mtime to skip hashing next time
+                self._write_snapshot(df, source_info)
+            else:
+                df = pq.read_table(snapshot_path).to_pandas()
+                source_info['sha256'] = stored.get('sha256')
+            
+            print(f"✓ Snapshot loaded from: {snapshot_path}")
+            return df
+        except Exception as e:
+            print(f"⚠ Could not read snapshot, falling back to CSV: {e}")
+            return None
+    
+    def _write_snapshot(self, df, source_info):
+        """Write the typed frame beside the CSV, tagged with the CSV it was built from"""
+        if pq is None:
+            print("⚠ pyarrow not installed, skipping data snapshot")
+            return
+        
+        snapshot_path = self.config.snapshot_file_path
+        tmp_path = snapshot_path.with_name(f"{snapshot_path.name}.{os.getpid()}.tmp")
+        try:
+            if source_info['sha256'] is None:
+                source_info['sha256'] = self._hash_file(self.config.data_file_path)
+            
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[SNAPSHOT_METADATA_KEY] = json.dumps({**source_info, 'version': SNAPSHOT_FORMAT_VERSION})
+            table = table.replace_schema_metadata(metadata)
+            
+            # Write then rename so concurrent workers never read a half-written file
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, snapshot_path)
+            print(f"✓ Snapshot written to: {snapshot_path}")
+        except Exception as e:
+            print(f"⚠ Could not write snapshot: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+    
     def load_classes_data(self):
         """Load the IPO classes data"""
         classes_path = self.config.classes_file_path
@@ -64,6 +306,74 @@ class TrademarkDataLoader:
             self._df = self.load_main_data()
         return self._df
     
+    @property
+    def search_index(self):
+        """Get the search index for the main dataframe, building it if necessary"""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.df, self._link_prefix)
+        return self._search_index
+    
+    @property
+    def aggregates(self):
+        """Get the materialized counts for the current data, building them if necessary"""
+        if self._aggregates is None:
+            self._aggregates = DatasetAggregates.from_frame(self.df)
+        return self._aggregates
+    
+    @property
+    def class_table(self):
+        """Get the long (row_id, owner_code, class_int, date) table, building it if necessary"""
+        if self._class_table is None:
+            self._class_table = self._build_class_table()
+        return self._class_table
+    
+    def current_state(self):
+        """The frame, search index, link prefix and version as one consistent DataState"""
+        if self._search_index is None:
+            # Lazy loading publishes under the state lock itself
+            self.search_index
+        with self._state_lock:
+            return DataState(self._df, self._search_index, self._link_prefix, self.dataset_version)
+    
+    def _build_class_table(self, df=None, search_index=None):
+        """One row per (mark, class) pair, exploded from the class index"""
+        df = self.df if df is None else df
+        class_index = (self.search_index if search_index is None else search_index).classes
+        if class_index is None:
+            row_ids = class_ints = np.empty(0, dtype=np.int32)
+        else:
+            row_ids, class_ints = class_index.explode()
+        
+        table = pd.DataFrame({'row_id': row_ids, 'class_int': class_ints})
+        if 'Owner' in df.columns:
+            table['owner_code'] = self.owner_codes(df)[row_ids]
+        if 'Date_sort' in df.columns:
+            table['date'] = df['Date_sort'].values[row_ids]
+        return table
+    
+    def owner_codes(self, df=None):
+        """Integer code per row for the Owner column (-1 when missing), matching owner_names()"""
+        owners = (self.df if df is None else df)['Owner']
+        if isinstance(owners.dtype, pd.CategoricalDtype):
+            return owners.cat.codes.values.astype(np.int32)
+        return pd.Categorical(owners).codes.astype(np.int32)
+    
+    def owner_names(self):
+        """Owner names indexed by owner code"""
+        owners = self.df['Owner']
+        if isinstance(owners.dtype, pd.CategoricalDtype):
+            return owners.cat.categories
+        return pd.Categorical(owners).categories
+    
+    @property
+    def similarity_index(self):
+        """Get the similar-mark index for the Word column, building it if necessary"""
+        if self._similarity_index is None:
+            df = self.df
+            word_series = df['Word'] if 'Word' in df.columns else pd.Series([], dtype=object)
+            self._similarity_index = SimilarityIndex(word_series)
+        return self._similarity_index
+    
     @property
     def classes_df(self):
         """Get the classes dataframe, loading if necessary"""
@@ -71,61 +381,324 @@ class TrademarkDataLoader:
             self._classes_df = self.load_classes_data()
         return self._classes_df
     
+    def expand_links(self, frame, link_prefix=None):
+        """Return the frame with full Link URLs restored from the compact suffixes"""
+        link_prefix = self._link_prefix if link_prefix is None else link_prefix
+        if not link_prefix or 'Link' not in frame.columns:
+            return frame
+        frame = frame.copy()
+        frame['Link'] = link_prefix + frame['Link']
+        return frame
+    
+    def prepare_output(self, frame, link_prefix=None):
+        """Drop internal columns and restore full values before a frame leaves the loader"""
+        if 'Date_sort' in frame.columns:
+            frame = frame.drop('Date_sort', axis=1)
+        return self.expand_links(frame, link_prefix)
+    
+    def iter_output_chunks(self, frame, chunk_rows=None, link_prefix=None):
+        """Yield prepare_output() of consecutive row chunks, so exports never copy the whole frame"""
+        chunk_rows = chunk_rows or self.config.EXPORT_CHUNK_ROWS
+        # Bind the prefix now: a reload during a long download must not mix two datasets' links
+        link_prefix = self._link_prefix if link_prefix is None else link_prefix
+        
+        def chunks():
+            for start in range(0, max(len(frame), 1), chunk_rows):
+                chunk = frame.iloc[start:start + chunk_rows]
+                if 'Date_sort' in chunk.columns:
+                    chunk = chunk.drop('Date_sort', axis=1)
+                if link_prefix and 'Link' in chunk.columns:
+                    chunk = chunk.copy()
+                    chunk['Link'] = link_prefix + chunk['Link']
+                yield chunk
+        return chunks()
+    
+    def get_excel_export(self):
+        """Path of the full-data .xlsx for the current dataset version, built on first request"""
+        df = self.df
+        version = self.dataset_version
+        export_dir = self.config.export_cache_dir
+        export_path = export_dir / f"trademark_data_{version}.xlsx"
+        
+        # One build per version even when several downloads start at once
+        with self._export_lock:
+            if export_path.exists():
+                return export_path
+            
+            export_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = export_path.with_name(f"{export_path.name}.{os.getpid()}.tmp")
+            try:
+                write_excel(self.iter_output_chunks(df), tmp_path)
+                os.replace(tmp_path, export_path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            print(f"✓ Excel export written to: {export_path}")
+            
+            # Files for older versions will never be served again
+            for stale_path in export_dir.glob('trademark_data_*.xlsx'):
+                if stale_path != export_path:
+                    stale_path.unlink(missing_ok=True)
+        return export_path
+    
+    def get_memory_report(self):
+        """Per-column memory use before and after compaction, or None if not compacted"""
+        if self._memory_report is None:
+            df = self.df
+            usage = df.memory_usage(deep=True, index=False)
+            return {
+                'columns': {col: {'before': int(usage[col]), 'after': int(usage[col])} for col in df.columns},
+                'total_before': int(usage.sum()),
+                'total_after': int(usage.sum()),
+                'link_prefix': ''
+            }
+        return self._memory_report
+    
+    def get_cache_stats(self):
+        """Result cache counters plus the dataset version they apply to"""
+        stats = self.result_cache.get_stats()
+        stats['order_cache'] = self.order_cache.get_stats()
+        stats['dataset_version'] = self.dataset_version
+        return stats
+    
     def get_data_stats(self):
         """Get basic statistics about the loaded data"""
-        df = self.df
+        return self.aggregates.data_stats()
+    
+    def get_owner_trademarks(self, owner_name):
+        """Trademarks of one owner (or of owners whose name contains it), newest first"""
+        state = self.current_state()
+        return state.df.iloc[self._owner_rows(state, owner_name)]
+    
+    def get_owner_page(self, owner_name, offset=0, limit=100):
+        """One page of an owner's trademarks, newest first, ready for JSON"""
+        if offset < 0 or limit < 1:
+            raise ValueError("offset must be >= 0 and limit >= 1")
+        state = self.current_state()
+        rows = self._owner_rows(state, owner_name)
+        page = state.df.iloc[rows[offset:offset + limit]]
+        next_offset = offset + limit if offset + limit < len(rows) else None
         return {
-            'total_records': len(df),
-            'unique_words': df['Word'].nunique() if 'Word' in df.columns else 0,
-            'unique_owners': df['Owner'].nunique() if 'Owner' in df.columns else 0,
-            'links_count': df['Link'].notna().sum() if 'Link' in df.columns else 0,
-            'unique_classes': df['Classes'].nunique() if 'Classes' in df.columns else 0
+            'owner': owner_name,
+            'results': self.prepare_output(page, state.link_prefix).to_dict('records'),
+            'count': len(page),
+            'total': len(rows),
+            'offset': offset,
+            'limit': limit,
+            'next_offset': next_offset
         }
     
-    def search_data(self, query, field='all', sort_by='', sort_order='asc', limit=100):
-        """Search the trademark data"""
-        df = self.df
+    def _owner_rows(self, state, owner_name):
+        """Row ids for an owner lookup, cached so paging through an owner stays cheap"""
+        owners = state.search_index.owners
+        if owners is None:
+            return np.empty(0, dtype=np.int32)
+        # A short substring can match most of the table, so these share the byte-bounded order cache
+        key = ('owner_rows', state.version, owner_name)
+        rows, = self.order_cache.get_or_compute(key, lambda: (owners.lookup(owner_name).astype(np.int32),))
+        return rows
+    
+    def search_data(self, query, field='all', sort_by='', sort_order='asc', limit=100, match='contains',
+                    offset=0, cursor=None, classes=None, class_match='any'):
+        """Search the trademark data (match is 'contains', 'word', 'prefix' or 'query')
         
+        match='query' reads structured queries such as owner:"apple" AND class:9 NOT word:watch.
+        classes restricts results to marks in any (class_match='any') or all of the given classes.
+        Pages are selected with offset, or with the next_cursor of a previous page.
+        """
         if not query.strip():
             return {'results': [], 'count': 0}
         
+        # One consistent view of the data for the whole request, even if a reload lands meanwhile
+        state = self.current_state()
+        
+        # Parsed once per request; syntax errors surface as bad requests before anything is cached
+        plan = parse_query(query) if match == 'query' else None
+        
+        class_filter = self._class_filter(classes, class_match)
+        
+        after_key = self._decode_cursor(state, cursor, sort_by, sort_order) if cursor else None
+        key = ('search', state.version, query, field, sort_by, sort_order, limit, match, offset, after_key,
+               class_filter)
+        return dict(self.result_cache.get_or_compute(
+            key, lambda: self._run_search(state, query, field, sort_by, sort_order, limit, match, offset, after_key,
+                                          class_filter, plan)
+        ))
+    
+    def search_rows(self, query, field='all', sort_by='', sort_order='asc', match='contains',
+                    classes=None, class_match='any', state=None):
+        """Every row id matching a search, in display order (an empty query selects all rows)
+        
+        Pass the DataState the rows will be read from; the current one is used otherwise.
+        """
+        state = state or self.current_state()
+        plan = parse_query(query) if match == 'query' and query.strip() else None
+        class_filter = self._class_filter(classes, class_match)
+        rows, _ = self._ordered_matches(state, query.strip(), field, sort_by, sort_order, match, class_filter, plan)
+        return rows
+    
+    def _class_filter(self, classes, class_match):
+        """Normalized, hashable class filter for search cache keys"""
+        if class_match not in ('any', 'all'):
+            raise ValueError(f"Unknown class match '{class_match}', expected 'any' or 'all'")
+        if not classes:
+            return None
+        classes = tuple(sorted(set(int(c) for c in classes)))
+        # Unknown classes would drop out of the bitmask and leave an all-matching empty filter
+        invalid = [c for c in classes if not 1 <= c <= MAX_NICE_CLASS]
+        if invalid:
+            raise ValueError(f"Invalid classes {invalid}, Nice classes run from 1 to {MAX_NICE_CLASS}")
+        return classes, class_match
+    
+    def _run_search(self, state, query, field, sort_by, sort_order, limit, match, offset, after_key,
+                    class_filter=None, plan=None):
+        """Run a search against the given data state, bypassing the result cache"""
+        df = state.df
+        
         try:
-            # Apply search filter
-            if field == 'all':
-                mask = df.apply(lambda row: any(
-                    query.lower() in str(val).lower() for val in row if pd.notna(val)
-                ), axis=1)
-                results = df[mask]
-            else:
-                if field in df.columns:
-                    mask = df[field].astype(str).str.lower().str.contains(query.lower(), na=False)
-                    results = df[mask]
-                else:
-                    raise ValueError(f"Column '{field}' not found")
-            
-            # Apply sorting if requested
-            if sort_by and sort_by in df.columns:
-                ascending = sort_order == 'asc'
-                if sort_by == 'Date' and 'Date_sort' in results.columns:
-                    results = results.sort_values(by='Date_sort', ascending=ascending, na_position='last')
-                else:
-                    results = results.sort_values(by=sort_by, ascending=ascending, na_position='last')
+            rows, keys = self._ordered_matches(state, query, field, sort_by, sort_order, match, class_filter, plan)
             
-            # Remove sorting column before returning
-            if 'Date_sort' in results.columns:
-                results = results.drop('Date_sort', axis=1)
+            # A cursor resumes after the last row of the previous page
+            if after_key is not None:
+                start = int(np.searchsorted(keys, after_key, side='right'))
+            else:
+                start = max(0, offset)
+            end = min(start + limit, len(rows))
+            has_more = end < len(rows)
             
-            # Limit results
-            results_dict = results.head(limit).to_dict('records')
+            # Remove the sorting column before returning
+            results_dict = self.prepare_output(df.iloc[rows[start:end]], state.link_prefix).to_dict('records')
             
             return {
                 'results': results_dict,
-                'count': len(results),
+                'count': len(rows),
                 'total': len(df),
-                'truncated': len(results) > limit,
+                'truncated': has_more,
                 'sorted_by': sort_by,
-                'sort_order': sort_order
+                'sort_order': sort_order,
+                'match': match,
+                'offset': start,
+                'limit': limit,
+                'next_offset': end if has_more else None,
+                'next_cursor': (self._encode_cursor(state, keys[end - 1], sort_by, sort_order)
+                                if has_more and end > start else None),
+                'plan': plan.describe() if plan is not None else None
             }
             
         except Exception as e:
-            raise Exception(f'Search failed: {str(e)}')
\ No newline at end of file
+            raise Exception(f'Search failed: {str(e)}')
+    
+    def _ordered_matches(self, state, query, field, sort_by, sort_order, match, class_filter=None, plan=None):
+        """All matching row ids in display order with their sort keys, cached per query"""
+        key = ('search_order', state.version, query, field, sort_by, sort_order, match, class_filter)
+        return self.order_cache.get_or_compute(
+            key, lambda: self._compute_ordered_matches(state, query, field, sort_by, sort_order, match,
+                                                       class_filter, plan)
+        )
+    
+    def _compute_ordered_matches(self, state, query, field, sort_by, sort_order, match, class_filter=None,
+                                 plan=None):
+        """Match the query and order the rows using the precomputed sort permutations"""
+        df, search_index = state.df, state.search_index
+        
+        if not query:
+            # Only exports select without a query
+            row_ids = np.arange(len(df))
+        elif match == 'query':
+            # Structured queries name their own fields
+            row_ids = execute_query(plan if plan is not None else parse_query(query), df, search_index)
+        else:
+            # Apply search filter
+            if field == 'all':
+                fields = list(df.columns)
+            elif field in df.columns:
+                fields = [field]
+            else:
+                raise ValueError(f"Column '{field}' not found")
+            row_ids = search_index.search(query, fields, match)
+        
+        # Class filters are a bitmask test against the class index
+        if class_filter and search_index.classes is not None:
+            classes, class_match = class_filter
+            in_classes = search_index.classes.match_mask(classes, require_all=class_match == 'all')
+            row_ids = row_ids[in_classes[row_ids]]
+        
+        rows, keys = self._order_matches(state, row_ids, sort_by, sort_order)
+        # Row ids and sort keys are positions in the frame, so int32 halves what the cache holds
+        rows32 = rows.astype(np.int32)
+        return rows32, rows32 if keys is rows else keys.astype(np.int32)
+    
+    def _order_matches(self, state, row_ids, sort_by, sort_order):
+        """Order matched rows using the precomputed sort permutations"""
+        df = state.df
+        
+        # Apply sorting if requested
+        if not sort_by or sort_by not in df.columns:
+            return row_ids, row_ids
+        
+        ascending = sort_order == 'asc'
+        sort_column = 'Date_sort' if sort_by == 'Date' and 'Date_sort' in df.columns else sort_by
+        if sort_column in state.search_index.sorters:
+            return state.search_index.sorters[sort_column].order_rows(row_ids, ascending)
+        
+        # Columns without a permutation fall back to sorting the matched subset
+        order = df[sort_column].iloc[row_ids].reset_index(drop=True).sort_values(
+            ascending=ascending, na_position='last', kind='stable'
+        ).index.values
+        return row_ids[order], np.arange(len(row_ids))
+    
+    def _encode_cursor(self, state, sort_key, sort_by, sort_order):
+        """Opaque cursor pointing just past a row's position in the sorted results"""
+        payload = {'v': state.version, 's': sort_by, 'o': sort_order, 'k': int(sort_key)}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    
+    def _decode_cursor(self, state, cursor, sort_by, sort_order):
+        """Sort key stored in a cursor, checked against the current data and ordering"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            sort_key = int(payload['k'])
+        except Exception:
+            raise ValueError('Invalid cursor')
+        
+        if payload.get('v') != state.version:
+            raise ValueError('Cursor refers to an older version of the data, restart from the first page')
+        if payload.get('s') != sort_by or payload.get('o') != sort_order:
+            raise ValueError('Cursor was issued for a different sort order')
+        return sort_key
+    
+    def suggest(self, query, field='all', limit=10):
+        """Suggest completions for Word and Owner values, ranked by frequency"""
+        query = query.strip()
+        if not query:
+            return {'suggestions': [], 'query': query}
+        
+        if field == 'all':
+            fields = list(self.search_index.suggesters)
+        elif field in self.search_index.suggesters:
+            fields = [field]
+        else:
+            raise ValueError(f"Suggestions are not available for '{field}'")
+        
+        return {
+            'suggestions': self.search_index.suggest(query, fields, limit),
+            'query': query,
+            'field': field
+        }
+    
+    def find_similar_marks(self, query, limit=20, max_distance=2, min_score=70):
+        """Find marks spelled or sounding like the query, for clearance searches"""
+        # The delete index only finds spellings up to MAX_EDIT_DISTANCE apart
+        if not 0 <= max_distance <= MAX_EDIT_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {MAX_EDIT_DISTANCE}")
+        query = query.strip()
+        if not query:
+            return {'results': [], 'count': 0, 'query': query}
+        
+        results = self.similarity_index.find_similar(query, limit, max_distance, min_score)
+        return {
+            'results': results,
+            'count': len(results),
+            'query': query,
+            'max_distance': max_distance,
+            'min_score': min_score
+        }
@@ -0,0 +1,134 @@
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Binary export formats are optional
+    pa = None
+    pq = None
+
+def stream_csv(chunks):
+    """Encode frame chunks as one CSV document, header first, one chunk at a time"""
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+def stream_ndjson(chunks):
+    """Encode frame chunks as newline-delimited JSON, one object per row"""
+    for chunk in chunks:
+        if len(chunk):
+            yield chunk.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n').encode('utf-8') + b'\n'
+
+def _arrow_batches(chunks):
+    """Record batches with every column as a plain string, so all batches share one schema"""
+    schema = None
+    for chunk in chunks:
+        if schema is None:
+            schema = pa.schema([(str(name), pa.string()) for name in chunk.columns])
+        table = pa.Table.from_pandas(chunk.astype(object), schema=schema, preserve_index=False)
+        yield schema, table
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def stream_arrow(chunks):
+    """Encode frame chunks as an Arrow IPC stream, one record batch per chunk"""
+    sink = _DrainableSink()
+    writer = None
+    for schema, table in _arrow_batches(chunks):
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+def stream_parquet(chunks):
+    """Encode frame chunks as a Parquet file, one row group per chunk"""
+    sink = _DrainableSink()
+    writer = None
+    for schema, table in _arrow_batches(chunks):
+        if writer is None:
+            writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+# Export format name -> (encoder, mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv', 'csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson', 'ndjson'),
+    'arrow': (stream_arrow, 'application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': (stream_parquet, 'application/vnd.apache.parquet', 'parquet')
+}
+
+def export_format(name):
+    """Encoder, mimetype and extension for an export format, checked before any bytes are sent"""
+    if name not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{name}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if name in ('arrow', 'parquet') and pa is None:
+        raise ValueError(f"{name} export needs pyarrow, which is not installed")
+    return EXPORT_FORMATS[name]
+
+# Rows per worksheet in .xlsx, including the header row
+EXCEL_MAX_ROWS = 1048576
+
+def write_excel(chunks, path, sheet_name='Trademark Data', max_rows=EXCEL_MAX_ROWS):
+    """Write frame chunks to an .xlsx file in openpyxl write-only mode, starting a new sheet at the row limit"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = 0
+    header = None
+    for chunk in chunks:
+        if header is None:
+            header = list(chunk.columns)
+        # Missing values become empty cells, as with DataFrame.to_excel
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if sheet is None or sheet_rows >= max_rows:
+                sheet_number = len(workbook.worksheets) + 1
+                sheet = workbook.create_sheet(sheet_name if sheet_number == 1 else f"{sheet_name} ({sheet_number})")
+                sheet.append([_header_cell(sheet, name, WriteOnlyCell, Font) for name in header])
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+
+    if sheet is None:
+        sheet = workbook.create_sheet(sheet_name)
+        if header:
+            sheet.append([_header_cell(sheet, name, WriteOnlyCell, Font) for name in header])
+    workbook.save(path)
+
+def _header_cell(sheet, name, cell_class, font_class):
+    cell = cell_class(sheet, value=name)
+    cell.font = font_class(bold=True)
+    return cell
@@ -1,4 +1,4 @@
-from flask import Blueprint
+from flask import Blueprint, request
 from base_template import BaseTemplate  # Changed from templates.base_template
 import pandas as pd
 
@@ -103,10 +103,11 @@ class MainRoutes:
         <div class="card mb-4" style="background: linear-gradient(135deg, #ffecd2 0%, #fcb69f 100%);">
             <div class="card-body">
                 <div class="row g-3">
-                    <div class="col-md-6">
-                        <input type="text" id="search-input" class="form-control form-control-lg" placeholder="Enter search term...">
+                    <div class="col-md-5">
+                        <input type="text" id="search-input" class="form-control form-control-lg" placeholder="Enter search term..." list="search-suggestions" autocomplete="off">
+                        <datalist id="search-suggestions"></datalist>
                     </div>
-                    <div class="col-md-3">
+                    <div class="col-md-2">
                         <select id="field-select" class="form-select form-select-lg">
                             <option value="all">All Fields</option>
                             <option value="Word">Word</option>
@@ -115,6 +116,14 @@ class MainRoutes:
                             <option value="Date">Date</option>
                         </select>
                     </div>
+                    <div class="col-md-2">
+                        <select id="match-select" class="form-select form-select-lg">
+                            <option value="contains">Contains</option>
+                            <option value="word">Whole Words</option>
+                            <option value="prefix">Word Prefix</option>
+                            <option value="query" title='e.g. owner:"apple" AND class:9 AND date:2024-01..2024-06 NOT word:watch'>Query Syntax</option>
+                        </select>
+                    </div>
                     <div class="col-md-3">
                         <button id="search-button" class="btn btn-primary btn-lg w-100">
                             <i class="fas fa-search me-2"></i>Search
@@ -152,6 +161,11 @@ class MainRoutes:
                         <tbody id="results-table"></tbody>
                     </table>
                 </div>
+                <div class="text-center">
+                    <button id="load-more-button" class="btn btn-outline-primary d-none">
+                        <i class="fas fa-chevron-down me-2"></i>Load More
+                    </button>
+                </div>
             </div>
         </div>
         <div id="no-results" class="card d-none">
@@ -278,12 +292,20 @@ class MainRoutes:
         # Decode the owner name from URL
         decoded_owner = urllib.parse.unquote(owner_name)
         
-        # Get all trademarks for this owner
-        owner_trademarks = self.data_loader.df[
-            self.data_loader.df['Owner'].str.contains(decoded_owner, case=False, na=False, regex=False)
-        ].copy()
+        # Get one page of this owner's trademarks, newest first, from the owner index
+        page_size = self.data_loader.config.OWNER_PAGE_SIZE
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        owner_page = self.data_loader.get_owner_page(decoded_owner, (page - 1) * page_size, page_size)
+        total = owner_page['total']
+        if total and not owner_page['count']:
+            # Past the end: show the last page instead of an empty table
+            page = (total + page_size - 1) // page_size
+            owner_page = self.data_loader.get_owner_page(decoded_owner, (page - 1) * page_size, page_size)
         
-        if owner_trademarks.empty:
+        if total == 0:
             content = f"""
             <div class="section-header">
                 <h1><i class="fas fa-user me-3"></i>No Trademarks Found</h1>
@@ -296,37 +318,14 @@ class MainRoutes:
             </div>
             """
         else:
-            # Sort by date if available, otherwise by word
-            if 'Date_sort' in owner_trademarks.columns:
-                owner_trademarks = owner_trademarks.sort_values('Date_sort', ascending=False, na_position='last')
-            else:
-                owner_trademarks = owner_trademarks.sort_values('Word', na_position='last')
-            
-            # Remove the sorting column for display
-            display_df = owner_trademarks.drop('Date_sort', axis=1) if 'Date_sort' in owner_trademarks.columns else owner_trademarks
-            
-            # Create table rows
-            table_rows = ""
-            for _, row in display_df.iterrows():
-                link_cell = ""
-                if pd.notna(row.get('Link')) and str(row['Link']).strip():
-                    link_cell = f'<a href="{row["Link"]}" target="_blank" class="trademark-link"><i class="fas fa-external-link-alt me-1"></i>View</a>'
-                else:
-                    link_cell = '<span class="text-muted">-</span>'
-                
-                table_rows += f"""
-                    <tr>
-                        <td><strong>{row.get('Word', 'N/A')}</strong></td>
-                        <td>{row.get('Classes', 'N/A')}</td>
-                        <td>{row.get('Date', 'N/A')}</td>
-                        <td>{link_cell}</td>
-                    </tr>
-                """
+            # Only the rows of this page are rendered
+            table_rows = self._owner_table_rows(pd.DataFrame(owner_page['results']))
+            pagination = self._owner_pagination(urllib.parse.quote(decoded_owner), page, page_size, total)
             
             content = f"""
             <div class="section-header">
                 <h1><i class="fas fa-user me-3"></i>{decoded_owner}</h1>
-                <p class="text-muted">{len(owner_trademarks)} trademark(s) found</p>
+                <p class="text-muted">{total} trademark(s) found</p>
             </div>
             
             <div class="row mb-4">
@@ -346,7 +345,7 @@ class MainRoutes:
                 <div class="card-body">
                     <div class="d-flex justify-content-between align-items-center mb-3">
                         <h5><i class="fas fa-list me-2"></i>Trademarks</h5>
-                        <span class="badge bg-info fs-6">{len(owner_trademarks)} total</span>
+                        <span class="badge bg-info fs-6">{total} total</span>
                     </div>
                     <div class="table-responsive">
                         <table class="table table-hover">
@@ -363,6 +362,7 @@ class MainRoutes:
                             </tbody>
                         </table>
                     </div>
+                    {pagination}
                 </div>
             </div>
             """
@@ -385,6 +385,43 @@ class MainRoutes:
             extra_js=export_js
         )
     
+    def _owner_table_rows(self, display_df):
+        """Table rows for one page of owner trademarks, formatted column-wise"""
+        def column(name):
+            if name not in display_df.columns:
+                return pd.Series('N/A', index=display_df.index)
+            return display_df[name].astype(str)
+        
+        links = column('Link')
+        has_link = display_df['Link'].notna() & (links.str.strip() != '') if 'Link' in display_df.columns else links != links
+        link_cells = ('<a href="' + links + '" target="_blank" class="trademark-link">'
+                      '<i class="fas fa-external-link-alt me-1"></i>View</a>')
+        link_cells = link_cells.where(has_link, '<span class="text-muted">-</span>')
+        
+        rows = ('<tr><td><strong>' + column('Word') + '</strong></td><td>' + column('Classes')
+                + '</td><td>' + column('Date') + '</td><td>' + link_cells + '</td></tr>')
+        return '\n'.join(rows)
+    
+    def _owner_pagination(self, owner_name, page, page_size, total):
+        """Previous/next links and the range shown on an owner page"""
+        num_pages = max((total + page_size - 1) // page_size, 1)
+        first = min((page - 1) * page_size + 1, total)
+        last = min(page * page_size, total)
+        
+        def page_link(target, label, enabled):
+            state = '' if enabled else ' disabled'
+            return f'<li class="page-item{state}"><a class="page-link" href="/owner/{owner_name}?page={target}">{label}</a></li>'
+        
+        return f"""
+                    <div class="d-flex justify-content-between align-items-center">
+                        <span class="text-muted">Showing {first}-{last} of {total} (page {page} of {num_pages})</span>
+                        <ul class="pagination mb-0">
+                            {page_link(page - 1, 'Previous', page > 1)}
+                            {page_link(page + 1, 'Next', page < num_pages)}
+                        </ul>
+                    </div>
+        """
+    
     def export_page(self):
         """Export page route handler"""
         content = """
@@ -418,6 +455,41 @@ class MainRoutes:
                 </div>
             </div>
         </div>
+        <div class="card mt-4">
+            <div class="card-body">
+                <h5><i class="fas fa-filter me-2"></i>Export Search Results</h5>
+                <p class="text-muted">Download only the rows matching a search, in a binary format for notebooks. Leave the query empty to export everything.</p>
+                <form action="/api/export" method="get" class="row g-3">
+                    <div class="col-md-4">
+                        <input type="text" name="query" class="form-control" placeholder='Query, e.g. owner:"apple" class:9'>
+                    </div>
+                    <div class="col-md-2">
+                        <select name="match" class="form-select">
+                            <option value="contains">Contains</option>
+                            <option value="word">Whole word</option>
+                            <option value="prefix">Word prefix</option>
+                            <option value="query">Structured query</option>
+                        </select>
+                    </div>
+                    <div class="col-md-2">
+                        <select name="format" class="form-select">
+                            <option value="parquet">Parquet</option>
+                            <option value="arrow">Arrow IPC</option>
+                            <option value="ndjson">NDJSON</option>
+                            <option value="csv">CSV</option>
+                        </select>
+                    </div>
+                    <div class="col-md-2">
+                        <input type="text" name="columns" class="form-control" placeholder="Columns, e.g. Word,Owner">
+                    </div>
+                    <div class="col-md-2">
+                        <button type="submit" class="btn btn-info w-100">
+                            <i class="fas fa-download me-2"></i>Export
+                        </button>
+                    </div>
+                </form>
+            </div>
+        </div>
         """
         
         return self.base_template.get_template().format(
@@ -508,6 +580,7 @@ class MainRoutes:
             document.addEventListener('DOMContentLoaded', function() {
                 const searchInput = document.getElementById('search-input');
                 const fieldSelect = document.getElementById('field-select');
+                const matchSelect = document.getElementById('match-select');
                 const searchButton = document.getElementById('search-button');
                 const resultsTable = document.getElementById('results-table');
                 const resultsContainer = document.getElementById('results-container');
@@ -516,12 +589,42 @@ class MainRoutes:
                 const loadingElement = document.getElementById('loading');
                 const noResultsElement = document.getElementById('no-results');
 
+                const suggestionsList = document.getElementById('search-suggestions');
+                const loadMoreButton = document.getElementById('load-more-button');
+
                 let currentResults = [];
                 let currentSort = { column: null, direction: 'asc' };
+                let suggestTimer = null;
+                let nextCursor = null;
+                let lastSearchUrl = null;
+
+                function fetchSuggestions() {
+                    const query = searchInput.value.trim();
+                    const field = fieldSelect.value;
+
+                    if (!query || !['all', 'Word', 'Owner'].includes(field)) {
+                        suggestionsList.innerHTML = '';
+                        return;
+                    }
+
+                    fetch(`/api/suggest?query=${encodeURIComponent(query)}&field=${field}`)
+                        .then(response => response.json())
+                        .then(data => {
+                            suggestionsList.innerHTML = '';
+                            (data.suggestions || []).forEach(suggestion => {
+                                const option = document.createElement('option');
+                                option.value = suggestion.value;
+                                option.label = `${suggestion.field} (${suggestion.count.toLocaleString()})`;
+                                suggestionsList.appendChild(option);
+                            });
+                        })
+                        .catch(error => console.error('Suggest error:', error));
+                }
 
                 function performSearch() {
                     const query = searchInput.value.trim();
                     const field = fieldSelect.value;
+                    const match = matchSelect.value;
 
                     if (!query) {
                         hideAllResults();
@@ -530,14 +633,16 @@ class MainRoutes:
 
                     showLoading();
 
-                    const url = `/api/search?query=${encodeURIComponent(query)}&field=${field}` +
+                    const url = `/api/search?query=${encodeURIComponent(query)}&field=${field}&match=${match}` +
                                (currentSort.column ? `&sort_by=${currentSort.column}&sort_order=${currentSort.direction}` : '');
 
+                    lastSearchUrl = url;
                     fetch(url)
                         .then(response => response.json())
                         .then(data => {
                             hideLoading();
                             currentResults = data.results || [];
+                            updateLoadMore(data.next_cursor);
 
                             if (data.results && data.results.length > 0) {
                                 displayResults(data.results, query, field);
@@ -553,6 +658,32 @@ class MainRoutes:
                         });
                 }
 
+                function loadMore() {
+                    if (!nextCursor || !lastSearchUrl) {
+                        return;
+                    }
+
+                    loadMoreButton.disabled = true;
+                    fetch(`${lastSearchUrl}&cursor=${encodeURIComponent(nextCursor)}`)
+                        .then(response => response.json())
+                        .then(data => {
+                            loadMoreButton.disabled = false;
+                            const results = data.results || [];
+                            currentResults = currentResults.concat(results);
+                            displayResults(results, searchInput.value.trim(), fieldSelect.value, true);
+                            updateLoadMore(data.next_cursor);
+                        })
+                        .catch(error => {
+                            console.error('Error:', error);
+                            loadMoreButton.disabled = false;
+                        });
+                }
+
+                function updateLoadMore(cursor) {
+                    nextCursor = cursor || null;
+                    loadMoreButton.classList.toggle('d-none', !nextCursor);
+                }
+
                 function sortResults(column) {
                     if (currentSort.column === column) {
                         currentSort.direction = currentSort.direction === 'asc' ? 'desc' : 'asc';
@@ -593,8 +724,10 @@ class MainRoutes:
                     loadingElement.style.display = 'none';
                 }
 
-                function displayResults(results, query, field) {
-                    resultsTable.innerHTML = '';
+                function displayResults(results, query, field, append = false) {
+                    if (!append) {
+                        resultsTable.innerHTML = '';
+                    }
                     results.forEach((result, index) => {
                         const row = document.createElement('tr');
 
@@ -644,6 +777,11 @@ class MainRoutes:
                 }
 
                 searchButton.addEventListener('click', performSearch);
+                loadMoreButton.addEventListener('click', loadMore);
+                searchInput.addEventListener('input', function() {
+                    clearTimeout(suggestTimer);
+                    suggestTimer = setTimeout(fetchSuggestions, 150);
+                });
                 searchInput.addEventListener('keypress', function(event) {
                     if (event.key === 'Enter') {
                         performSearch();
@@ -0,0 +1,192 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import yfinance as yf
+
+# Fields that move with the market; the rest of the stock data (name, sector, ...) is near-static
+QUOTE_FIELDS = ('price', 'market_cap', 'pe_ratio', 'dividend_yield')
+
+# Tickers CompanyMappings uses for companies that are not listed; never sent to a provider
+PLACEHOLDER_TICKERS = {'PRIVATE'}
+
+# HTTP statuses worth retrying: rate limiting and server-side failures
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def is_transient_error(error):
+    """Whether a fetch failure may succeed on retry (network trouble, HTTP 429 or 5xx)"""
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None) is not None:
+        return response.status_code in TRANSIENT_STATUS_CODES
+    return isinstance(error, (ConnectionError, TimeoutError, requests.ConnectionError, requests.Timeout))
+
+def is_cacheable(stock_data):
+    """Valid data, or a permanent failure worth remembering so the ticker is not fetched again soon"""
+    return stock_data.get('valid', False) or not stock_data.get('retryable', True)
+
+def stock_data_from_info(ticker, info):
+    """The fields the app keeps from a provider's quote info"""
+    return {
+        'ticker': ticker,
+        'name': info.get('longName', info.get('shortName', ticker)),
+        'price': info.get('currentPrice', info.get('regularMarketPrice')),
+        'market_cap': info.get('marketCap'),
+        'sector': info.get('sector'),
+        'industry': info.get('industry'),
+        'country': info.get('country'),
+        'exchange': info.get('exchange'),
+        'currency': info.get('currency', 'USD'),
+        'pe_ratio': info.get('forwardPE', info.get('trailingPE')),
+        'dividend_yield': info.get('dividendYield'),
+        'valid': True
+    }
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, up to capacity saved for bursts"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until the tokens are available, then take them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+class YFinanceProvider:
+    """Quote info from Yahoo Finance (one request per ticker; Yahoo has no bulk info endpoint)"""
+
+    name = 'yfinance'
+
+    def fetch_info(self, ticker):
+        """Stock data for one ticker"""
+        return stock_data_from_info(ticker, yf.Ticker(ticker).info)
+
+class StubProvider:
+    """Local provider with canned quotes, latency and failures, for development and tests"""
+
+    name = 'stub'
+    supports_bulk = True
+
+    def __init__(self, quotes=None, latency=0.0, fail_times=0, unknown_tickers=()):
+        self.quotes = quotes or {}
+        self.latency = latency
+        self.fail_times = fail_times
+        self.unknown_tickers = set(unknown_tickers)
+        self.calls = 0
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def _quote(self, ticker):
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts.get(ticker, 0) + 1
+            self._attempts[ticker] = attempt
+        if attempt <= self.fail_times:
+            raise ConnectionError(f"Stub failure {attempt} for {ticker}")
+        if ticker in self.unknown_tickers:
+            raise KeyError(f"Unknown ticker {ticker}")
+        info = self.quotes.get(ticker, {
+            'longName': f"{ticker} Stub Corp",
+            'currentPrice': 100.0,
+            'marketCap': 1_000_000_000,
+            'sector': 'Technology',
+            'country': 'United States'
+        })
+        return stock_data_from_info(ticker, info)
+
+    def fetch_info(self, ticker):
+        """Stock data for one ticker"""
+        time.sleep(self.latency)
+        return self._quote(ticker)
+
+    def fetch_many(self, tickers):
+        """Stock data for several tickers in one simulated request (failed tickers are left out)"""
+        time.sleep(self.latency)
+        results = {}
+        for ticker in tickers:
+            try:
+                results[ticker] = self._quote(ticker)
+            except Exception:
+                pass
+        return results
+
+def create_provider(config):
+    """Market data provider named by config.MARKET_DATA_PROVIDER"""
+    if config.MARKET_DATA_PROVIDER == 'stub':
+        return StubProvider(latency=0.05)
+    if config.MARKET_DATA_PROVIDER == 'yfinance':
+        return YFinanceProvider()
+    raise ValueError(f"Unknown market data provider '{config.MARKET_DATA_PROVIDER}'")
+
+class MarketDataFetcher:
+    """Fetches quotes for many tickers concurrently, rate limited and retried with backoff"""
+
+    def __init__(self, provider, max_workers=8, rate=4.0, burst=8, retries=3, backoff=0.5, bulk_size=50):
+        self.provider = provider
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.bulk_size = bulk_size
+
+    def _with_retries(self, fetch, label):
+        """Call fetch() under the rate limit, retrying transient failures with exponential backoff and jitter"""
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                return fetch()
+            except Exception as e:
+                if attempt == self.retries or not is_transient_error(e):
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+                print(f"⚠ Fetch failed for {label} ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def fetch_one(self, ticker):
+        """Stock data for one ticker, or an invalid marker with the error and whether it may be retried"""
+        if ticker in PLACEHOLDER_TICKERS:
+            return {'ticker': ticker, 'valid': False, 'error': 'Not a listed company', 'retryable': False}
+        try:
+            return self._with_retries(lambda: self.provider.fetch_info(ticker), ticker)
+        except Exception as e:
+            print(f"Error fetching data for {ticker}: {e}")
+            return {'ticker': ticker, 'valid': False, 'error': str(e), 'retryable': is_transient_error(e)}
+
+    def fetch_all(self, tickers):
+        """Stock data for every ticker, fetched through the worker pool"""
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+
+        results = {ticker: self.fetch_one(ticker) for ticker in tickers if ticker in PLACEHOLDER_TICKERS}
+        tickers = [ticker for ticker in tickers if ticker not in results]
+        if tickers and getattr(self.provider, 'supports_bulk', False):
+            # Bulk requests first; whatever they miss is fetched one by one below
+            batches = [tickers[i:i + self.bulk_size] for i in range(0, len(tickers), self.bulk_size)]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [pool.submit(self._with_retries, lambda b=batch: self.provider.fetch_many(b), 'bulk')
+                           for batch in batches]
+                for future in futures:
+                    try:
+                        results.update(future.result())
+                    except Exception as e:
+                        print(f"⚠ Bulk fetch failed: {e}")
+
+        remaining = [ticker for ticker in tickers if ticker not in results]
+        if remaining:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results.update(zip(remaining, pool.map(self.fetch_one, remaining)))
+        return results
@@ -0,0 +1,64 @@
+import re
+import numpy as np
+import pandas as pd
+
+def normalize_owner(name):
+    """Lowercase an owner name and collapse runs of whitespace"""
+    return re.sub(r'\s+', ' ', str(name)).strip().lower()
+
+class OwnerIndex:
+    """Row ids per normalized owner, stored newest first so owner pages are a slice"""
+
+    def __init__(self, owner_column, dates=None):
+        self.column = owner_column
+        num_rows = owner_column.num_rows
+
+        # Distinct Owner values that differ only in case or spacing share one owner id
+        normalized = owner_column.values.str.replace(r'\s+', ' ', regex=True).str.strip()
+        value_owners, names = pd.factorize(normalized)
+        self._owner_ids = {name: owner_id for owner_id, name in enumerate(names)}
+        row_owners = np.where(owner_column.codes >= 0, value_owners[owner_column.codes], -1)
+
+        # Newest first, undated last, ties kept in row order
+        if dates is not None:
+            date_codes, _ = pd.factorize(dates, sort=True)
+            self._date_keys = np.where(date_codes >= 0, -date_codes.astype(np.int64), 1)
+        else:
+            self._date_keys = np.zeros(num_rows, dtype=np.int64)
+        order = np.lexsort((np.arange(num_rows), self._date_keys, row_owners))
+        order = order[row_owners[order] >= 0]
+
+        # Rows of owner o are _rows[_offsets[o]:_offsets[o + 1]]
+        self._rows = order.astype(np.int32)
+        self._value_owners = value_owners
+        counts = np.bincount(row_owners[row_owners >= 0], minlength=len(names))
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def _owner_rows(self, owner_id):
+        return self._rows[self._offsets[owner_id]:self._offsets[owner_id + 1]].astype(np.int64)
+
+    def rows_for_owner(self, name):
+        """Row ids of the owner with exactly this (normalized) name, newest first"""
+        owner_id = self._owner_ids.get(normalize_owner(name))
+        if owner_id is None:
+            return np.empty(0, dtype=np.int64)
+        return self._owner_rows(owner_id)
+
+    def rows_matching(self, query):
+        """Row ids of every owner whose name contains the query, newest first"""
+        query = str(query).lower()
+        value_ids = self.column.values_containing(query)
+        owner_ids = np.unique(self._value_owners[value_ids])
+        if len(owner_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        if len(owner_ids) == 1:
+            return self._owner_rows(owner_ids[0])
+        rows = np.concatenate([self._owner_rows(owner_id) for owner_id in owner_ids])
+        return rows[np.lexsort((rows, self._date_keys[rows]))]
+
+    def lookup(self, name):
+        """Rows for an exact owner name, falling back to a substring match over owner names"""
+        rows = self.rows_for_owner(name)
+        if len(rows) == 0:
+            rows = self.rows_matching(name)
+        return rows
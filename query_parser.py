@@ -0,0 +1,313 @@
+import re
+import numpy as np
+import pandas as pd
+from class_index import MAX_NICE_CLASS
+
+# Quoted phrases, parentheses, or bare words (which may carry a field prefix like owner:)
+TOKEN_PATTERN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+
+KEYWORDS = {'AND', 'OR', 'NOT'}
+
+# Query field names and the dataframe columns they filter
+FIELD_ALIASES = {
+    'word': 'Word',
+    'mark': 'Word',
+    'owner': 'Owner',
+    'class': 'Classes',
+    'classes': 'Classes',
+    'date': 'Date_sort',
+    'link': 'Link'
+}
+
+DATE_PATTERN = re.compile(r'^(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?$')
+
+class QuerySyntaxError(ValueError):
+    """Raised when a structured query cannot be parsed"""
+
+def tokenize_query(text):
+    """Split a query into ('(' | ')' | 'PHRASE' | 'WORD' | 'KEYWORD', text) tokens"""
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise QuerySyntaxError(f"Unexpected character at position {position}: '{text[position]}'")
+        position = match.end()
+        open_paren, close_paren, phrase, word = match.groups()
+        if open_paren:
+            tokens.append(('(', open_paren))
+        elif close_paren:
+            tokens.append((')', close_paren))
+        elif phrase is not None:
+            tokens.append(('PHRASE', re.sub(r'\\(.)', r'\1', phrase)))
+        elif word in KEYWORDS:
+            tokens.append(('KEYWORD', word))
+        elif word:
+            tokens.append(('WORD', word))
+    return tokens
+
+def parse_date_bound(text, end=False):
+    """First instant of a YYYY, YYYY-MM or YYYY-MM-DD period, or the instant after it ends"""
+    match = DATE_PATTERN.match(text)
+    if not match:
+        raise QuerySyntaxError(f"Invalid date '{text}', expected YYYY, YYYY-MM or YYYY-MM-DD")
+    year, month, day = match.groups()
+    try:
+        start = pd.Timestamp(int(year), int(month or 1), int(day or 1))
+    except ValueError:
+        raise QuerySyntaxError(f"Invalid date '{text}'")
+    if not end:
+        return start
+    if day:
+        return start + pd.DateOffset(days=1)
+    if month:
+        return start + pd.DateOffset(months=1)
+    return start + pd.DateOffset(years=1)
+
+class QueryContext:
+    """Data a compiled query is evaluated against"""
+
+    def __init__(self, df, search_index):
+        self.df = df
+        self.search_index = search_index
+        self.num_rows = len(df)
+
+    def rows_to_mask(self, rows):
+        """Boolean row mask from row ids"""
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[rows] = True
+        return mask
+
+class TextPredicate:
+    """Substring match on one column (or every column), answered by the search index"""
+
+    cost = 2
+
+    def __init__(self, column, value):
+        self.column = column
+        self.value = value
+
+    def evaluate(self, context):
+        """Rows whose column contains the value"""
+        query = self.value.lower()
+        if self.column is not None and self.column not in context.search_index.columns:
+            return np.zeros(context.num_rows, dtype=bool)
+        if self.column is None:
+            rows = context.search_index.scan(query, list(context.df.columns))
+        else:
+            rows = context.search_index.columns[self.column].rows_containing(query)
+        return context.rows_to_mask(rows)
+
+    def describe(self):
+        """Readable form of this predicate for query plans"""
+        target = self.column or 'any field'
+        return f"{target} contains '{self.value}'"
+
+class ClassPredicate:
+    """Nice class membership, answered by the class bitmap index"""
+
+    cost = 1
+
+    def __init__(self, value):
+        self.classes = []
+        for part in value.split(','):
+            bounds = part.split('..')
+            try:
+                if len(bounds) not in (1, 2):
+                    raise ValueError
+                numbers = [int(bound) for bound in bounds]
+            except ValueError:
+                raise QuerySyntaxError(f"Invalid class '{part}', expected a number, list or range like 9..12")
+            # Bounds are checked before a range is expanded, so class:1..20000000 never builds a list
+            if not all(1 <= number <= MAX_NICE_CLASS for number in numbers):
+                raise QuerySyntaxError(f"Invalid class '{part}', Nice classes run from 1 to {MAX_NICE_CLASS}")
+            self.classes.extend(range(numbers[0], numbers[-1] + 1))
+
+    def evaluate(self, context):
+        """Rows registered in any of the classes"""
+        if context.search_index.classes is None:
+            return np.zeros(context.num_rows, dtype=bool)
+        return context.search_index.classes.match_mask(self.classes)
+
+    def describe(self):
+        """Readable form of this predicate for query plans"""
+        return f"class in {self.classes}"
+
+class DatePredicate:
+    """Publication date range, evaluated as a vectorized comparison on Date_sort"""
+
+    cost = 0
+
+    def __init__(self, value):
+        if '..' in value:
+            start_text, end_text = value.split('..', 1)
+        else:
+            start_text = end_text = value
+        if not start_text and not end_text:
+            raise QuerySyntaxError("A date range needs at least one bound")
+        self.start = parse_date_bound(start_text) if start_text else None
+        self.end = parse_date_bound(end_text, end=True) if end_text else None
+
+    def evaluate(self, context):
+        """Rows dated within [start, end)"""
+        if 'Date_sort' not in context.df.columns:
+            return np.zeros(context.num_rows, dtype=bool)
+        dates = context.df['Date_sort'].values
+        mask = ~np.isnat(dates)
+        if self.start is not None:
+            mask &= dates >= self.start.to_datetime64()
+        if self.end is not None:
+            mask &= dates < self.end.to_datetime64()
+        return mask
+
+    def describe(self):
+        """Readable form of this predicate for query plans"""
+        start = self.start.strftime('%Y-%m-%d') if self.start is not None else '-inf'
+        end = self.end.strftime('%Y-%m-%d') if self.end is not None else 'inf'
+        return f"date in [{start}, {end})"
+
+class AndNode:
+    """All children must match; cheap predicates run first and an empty result stops early"""
+
+    def __init__(self, children):
+        self.children = sorted(children, key=lambda child: child.cost)
+        self.cost = max(child.cost for child in children)
+
+    def evaluate(self, context):
+        """Intersection of the children's matches"""
+        mask = None
+        for child in self.children:
+            child_mask = child.evaluate(context)
+            mask = child_mask if mask is None else mask & child_mask
+            if not mask.any():
+                break
+        return mask
+
+    def describe(self):
+        """Readable form of this node for query plans"""
+        return 'AND(' + ', '.join(child.describe() for child in self.children) + ')'
+
+class OrNode:
+    """Any child may match"""
+
+    def __init__(self, children):
+        self.children = children
+        self.cost = max(child.cost for child in children)
+
+    def evaluate(self, context):
+        """Union of the children's matches"""
+        mask = np.zeros(context.num_rows, dtype=bool)
+        for child in self.children:
+            mask |= child.evaluate(context)
+        return mask
+
+    def describe(self):
+        """Readable form of this node for query plans"""
+        return 'OR(' + ', '.join(child.describe() for child in self.children) + ')'
+
+class NotNode:
+    """Rows the child does not match"""
+
+    def __init__(self, child):
+        self.child = child
+        self.cost = child.cost
+
+    def evaluate(self, context):
+        """Complement of the child's matches"""
+        return ~self.child.evaluate(context)
+
+    def describe(self):
+        """Readable form of this node for query plans"""
+        return f"NOT({self.child.describe()})"
+
+class QueryParser:
+    """Recursive descent parser for queries like owner:"apple" AND class:9 NOT word:watch
+
+    Grammar: expr := and (OR and)* ; and := unary ([AND] unary)* ;
+             unary := NOT unary | '(' expr ')' | term
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize_query(text)
+        self.position = 0
+
+    def parse(self):
+        """Parse the whole query into a predicate tree"""
+        if not self.tokens:
+            raise QuerySyntaxError("Empty query")
+        node = self._parse_or()
+        if self.position < len(self.tokens):
+            raise QuerySyntaxError(f"Unexpected '{self.tokens[self.position][1]}'")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def _parse_or(self):
+        children = [self._parse_and()]
+        while self._peek() == ('KEYWORD', 'OR'):
+            self._next()
+            children.append(self._parse_and())
+        return children[0] if len(children) == 1 else OrNode(children)
+
+    def _parse_and(self):
+        children = [self._parse_unary()]
+        while True:
+            kind, value = self._peek()
+            if kind == 'KEYWORD' and value == 'AND':
+                self._next()
+                children.append(self._parse_unary())
+            elif kind in ('WORD', 'PHRASE', '(') or (kind == 'KEYWORD' and value == 'NOT'):
+                # Adjacent terms are implicitly ANDed, so "a NOT b" means a AND NOT b
+                children.append(self._parse_unary())
+            else:
+                break
+        return children[0] if len(children) == 1 else AndNode(children)
+
+    def _parse_unary(self):
+        kind, value = self._next()
+        if kind == 'KEYWORD' and value == 'NOT':
+            return NotNode(self._parse_unary())
+        if kind == '(':
+            node = self._parse_or()
+            if self._next()[0] != ')':
+                raise QuerySyntaxError("Missing closing parenthesis")
+            return node
+        if kind == 'PHRASE':
+            return TextPredicate(None, value)
+        if kind == 'WORD':
+            return self._parse_term(value)
+        raise QuerySyntaxError(f"Unexpected '{value}'" if value else "Query ended unexpectedly")
+
+    def _parse_term(self, word):
+        field, separator, value = word.partition(':')
+        if not separator or field.lower() not in FIELD_ALIASES:
+            return TextPredicate(None, word)
+
+        # owner:"apple inc" puts the value in the following quoted phrase
+        if not value:
+            kind, phrase = self._next()
+            if kind != 'PHRASE':
+                raise QuerySyntaxError(f"Missing value for '{field}:'")
+            value = phrase
+
+        column = FIELD_ALIASES[field.lower()]
+        if column == 'Classes':
+            return ClassPredicate(value)
+        if column == 'Date_sort':
+            return DatePredicate(value)
+        return TextPredicate(column, value)
+
+def parse_query(text):
+    """Parse a structured query into an executable predicate tree"""
+    return QueryParser(text).parse()
+
+def execute_query(plan, df, search_index):
+    """Row ids matching a parsed query plan"""
+    return np.flatnonzero(plan.evaluate(QueryContext(df, search_index)))
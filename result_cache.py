@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+class ResultCache:
+    """Thread-safe LRU cache for query results, with hit and miss counters
+
+    With max_bytes and sizeof the cache is also bounded by the total size of its values; a value larger
+    than max_bytes on its own is returned without being stored.
+    """
+
+    def __init__(self, maxsize=256, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Compute outside the lock so slow queries don't block cache hits
+        value = compute()
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return value
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._sizes[key]
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                evicted, _ = self._entries.popitem(last=False)
+                self.bytes -= self._sizes.pop(evicted)
+        return value
+
+    def clear(self):
+        """Drop every cached entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def get_stats(self):
+        """Cache size and hit/miss counters for tuning"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
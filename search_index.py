@@ -0,0 +1,361 @@
+import re
+import numpy as np
+import pandas as pd
+from class_index import ClassIndex
+from owner_index import OwnerIndex
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Beyond this many matching values, one pass over the row codes beats gathering posting lists
+POSTING_GATHER_LIMIT = 256
+
+# Columns whose substring searches are narrowed through a trigram index
+TRIGRAM_COLUMNS = ('Word', 'Owner')
+
+# Columns offering typeahead completions
+SUGGEST_COLUMNS = ('Word', 'Owner')
+
+# Completions kept per precomputed prefix, the most a single suggest call may ask for
+SUGGEST_MAX_LIMIT = 50
+
+# Prefixes spanning more distinct values than this get their completions precomputed
+HEAVY_PREFIX_RANGE = 2000
+
+# Columns with a sort permutation precomputed at load time
+SORT_COLUMNS = ('Word', 'Owner', 'Classes', 'Date_sort')
+
+# Matches fewer than 1/SORT_GATHER_FACTOR of all rows are ordered by sorting their ranks;
+# larger match sets are read off the precomputed permutation in one pass
+SORT_GATHER_FACTOR = 16
+
+# Separates values when the distinct values are packed into one code point array
+VALUE_SEPARATOR = '\x00'
+
+# Sorts after every real token, used as the upper bound of a prefix range
+MAX_CHAR = '\U0010ffff'
+
+def tokenize(text):
+    """Split text into normalized (lowercase word) tokens"""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+def union_rows(row_arrays, num_rows):
+    """Sorted union of several row id arrays"""
+    row_arrays = [rows for rows in row_arrays if len(rows) > 0]
+    if not row_arrays:
+        return np.empty(0, dtype=np.int64)
+    if len(row_arrays) == 1:
+        return row_arrays[0]
+    mask = np.zeros(num_rows, dtype=bool)
+    for rows in row_arrays:
+        mask[rows] = True
+    return np.flatnonzero(mask)
+
+def trigram_keys(codepoints):
+    """Pack every run of three code points into one integer key (code points fit in 21 bits)"""
+    codepoints = codepoints.astype(np.int64)
+    return (codepoints[:-2] << 42) | (codepoints[1:-1] << 21) | codepoints[2:]
+
+class TrigramIndex:
+    """Trigram posting lists over a column's distinct lowercase values"""
+
+    def __init__(self, values):
+        self.values = values
+        packed = VALUE_SEPARATOR.join(values.tolist()) + VALUE_SEPARATOR
+        codepoints = np.frombuffer(packed.encode('utf-32-le'), dtype=np.uint32)
+
+        # Value id of each position, and whether a trigram starting there stays inside one value
+        is_separator = codepoints == 0
+        value_ids = np.cumsum(is_separator) - is_separator
+        keys = trigram_keys(codepoints)
+        inside = ~(is_separator[:-2] | is_separator[1:-1] | is_separator[2:])
+        keys, value_ids = keys[inside], value_ids[:-2][inside]
+
+        # Sort by (trigram, value) and drop repeats of a trigram within one value
+        order = np.lexsort((value_ids, keys))
+        keys, value_ids = keys[order], value_ids[order]
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (value_ids[1:] != value_ids[:-1])
+        keys, value_ids = keys[keep], value_ids[keep]
+
+        self.vocab, starts = np.unique(keys, return_index=True)
+        self._offsets = np.append(starts, len(keys))
+        self._value_ids = value_ids.astype(np.int32)
+
+    def candidates(self, query):
+        """Distinct value ids holding every trigram of the query (query must be 3+ chars)"""
+        query_keys = np.unique(trigram_keys(np.frombuffer(query.encode('utf-32-le'), dtype=np.uint32)))
+        positions = np.searchsorted(self.vocab, query_keys)
+        if np.any(positions >= len(self.vocab)) or np.any(self.vocab[np.minimum(positions, len(self.vocab) - 1)] != query_keys):
+            return np.empty(0, dtype=np.int64)
+
+        # Intersect the shortest posting lists first so the candidate set shrinks fastest
+        postings = sorted(
+            (self._value_ids[self._offsets[p]:self._offsets[p + 1]] for p in positions),
+            key=len
+        )
+        result = postings[0]
+        for posting in postings[1:]:
+            result = np.intersect1d(result, posting, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
+
+    def values_containing(self, query):
+        """Distinct value ids containing the query, checked exactly on trigram candidates"""
+        candidates = self.candidates(query)
+        if len(candidates) == 0:
+            return candidates
+        exact = self.values.iloc[candidates].str.contains(query, regex=False).values
+        return candidates[exact]
+
+class PrefixIndex:
+    """Sorted distinct values with frequencies, answering top-N completions for a prefix"""
+
+    def __init__(self, series):
+        counts = series.value_counts()
+        counts = counts[counts > 0]
+        frame = pd.DataFrame({'display': counts.index.astype(str), 'count': counts.values})
+        frame['key'] = frame['display'].str.lower()
+
+        # Case variants merge into one completion shown in their most frequent form
+        grouped = frame.groupby('key', sort=True).agg(display=('display', 'first'), count=('count', 'sum'))
+        self.keys = grouped.index.values.astype(object)
+        self.display = grouped['display'].values
+        self.counts = grouped['count'].values.astype(np.int64)
+
+        self._heavy = {}
+        self._build_heavy_prefixes()
+
+    def _top_in_range(self, lo, hi, limit):
+        """Ids in [lo, hi) with the highest counts, ties broken alphabetically"""
+        ids = np.arange(lo, hi)
+        counts = self.counts[lo:hi]
+        if len(ids) > limit:
+            keep = np.argpartition(-counts, limit - 1)[:limit]
+            ids, counts = ids[keep], counts[keep]
+        return ids[np.lexsort((ids, -counts))]
+
+    def _build_heavy_prefixes(self):
+        """Precompute completions for prefixes whose value range is too wide to rank per request"""
+        keys = pd.Series(self.keys, dtype=object)
+        length = 1
+        while True:
+            # Keys are sorted, so keys sharing a prefix of this length are contiguous
+            prefixes = keys.str.slice(0, length).values
+            groups, starts, sizes = np.unique(prefixes, return_index=True, return_counts=True)
+            heavy = sizes > HEAVY_PREFIX_RANGE
+            if not heavy.any():
+                break
+            for prefix, start, size in zip(groups[heavy], starts[heavy], sizes[heavy]):
+                self._heavy[prefix] = self._top_in_range(start, start + size, SUGGEST_MAX_LIMIT)
+            length += 1
+
+    def complete(self, prefix, limit=10):
+        """Top completions of a lowercase prefix as (display value, count) pairs"""
+        limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+        if prefix in self._heavy:
+            ids = self._heavy[prefix][:limit]
+        else:
+            lo = np.searchsorted(self.keys, prefix, side='left')
+            hi = np.searchsorted(self.keys, prefix + MAX_CHAR, side='left')
+            ids = self._top_in_range(lo, hi, limit)
+        return [(self.display[i], int(self.counts[i])) for i in ids]
+
+class SortPermutation:
+    """Row order of one column computed once, so sorted pages need no per-request sort"""
+
+    def __init__(self, series):
+        codes, _ = pd.factorize(series, sort=True)
+        self.num_valid = int((codes >= 0).sum())
+
+        # Missing values sort last in both directions, as with na_position='last'
+        codes = np.where(codes >= 0, codes, len(codes)).astype(np.int64)
+        self.order = np.argsort(codes, kind='stable').astype(np.int32)
+        self.rank = np.empty(len(codes), dtype=np.int32)
+        self.rank[self.order] = np.arange(len(codes), dtype=np.int32)
+
+    def sort_keys(self, rows, ascending=True):
+        """Position of each row in the ascending or descending column order"""
+        ranks = self.rank[rows].astype(np.int64)
+        if ascending:
+            return ranks
+        return np.where(ranks < self.num_valid, self.num_valid - 1 - ranks, ranks)
+
+    def order_rows(self, rows, ascending=True):
+        """Rows in column order, with their sort keys (strictly increasing)"""
+        num_rows = len(self.rank)
+        if len(rows) * SORT_GATHER_FACTOR < num_rows:
+            keys = self.sort_keys(rows, ascending)
+            order = np.argsort(keys)
+            return rows[order], keys[order]
+
+        if ascending:
+            order = self.order
+        else:
+            order = np.concatenate([self.order[:self.num_valid][::-1], self.order[self.num_valid:]])
+        mask = np.zeros(num_rows, dtype=bool)
+        mask[rows] = True
+        selected = mask[order]
+        return order[selected].astype(np.int64), np.flatnonzero(selected)
+
+class ColumnIndex:
+    """Dictionary-encoded column with an inverted token index over its distinct values"""
+
+    def __init__(self, series, prefix='', trigrams=False):
+        codes, uniques = pd.factorize(series)
+        self.num_rows = len(codes)
+        self.codes = codes.astype(np.int32)
+        self.prefix = prefix.lower()
+        self.values = self._lower_strings(uniques)
+
+        # Rows holding value v are _row_order[_row_offsets[v]:_row_offsets[v + 1]]
+        order = np.argsort(self.codes, kind='stable').astype(np.int32)
+        self._row_order = order[self.codes[order] >= 0]
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.values))
+        self._row_offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        self._build_token_postings()
+        self._trigrams = TrigramIndex(self.values) if trigrams else None
+
+    def _lower_strings(self, uniques):
+        """Lowercased string form of each distinct value, as str(value).lower() would give"""
+        uniques = pd.Index(uniques)
+        if isinstance(uniques, pd.DatetimeIndex):
+            strings = uniques.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            strings = uniques.astype(str)
+        return pd.Series(strings, dtype=object).str.lower()
+
+    def _build_token_postings(self):
+        """Map each token to the distinct values containing it, with a sorted vocabulary"""
+        tokens = self.values.str.findall(TOKEN_PATTERN).explode().dropna()
+        token_codes, vocab = pd.factorize(tokens.values, sort=True)
+        value_ids = tokens.index.values.astype(np.int64)
+
+        # One integer key per (token, value) pair sorts and de-duplicates without string compares
+        stride = max(len(self.values), 1)
+        keys = np.unique(token_codes.astype(np.int64) * stride + value_ids)
+
+        self.vocab = np.asarray(vocab, dtype=object)
+        self._token_offsets = np.searchsorted(keys // stride, np.arange(len(self.vocab) + 1))
+        self._token_values = (keys % stride).astype(np.int32)
+
+        # Tokens in a shared prefix (e.g. the Link URL base) hold for every stored value
+        self._prefix_tokens = set(tokenize(self.prefix))
+
+    def rows_for_values(self, value_ids):
+        """Sorted row ids holding any of the given distinct values"""
+        if len(value_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        if len(value_ids) > POSTING_GATHER_LIMIT:
+            value_mask = np.zeros(len(self.values) + 1, dtype=bool)
+            value_mask[value_ids] = True
+            # Code -1 (missing) indexes the trailing False entry
+            return np.flatnonzero(value_mask[self.codes])
+        rows = np.concatenate([
+            self._row_order[self._row_offsets[v]:self._row_offsets[v + 1]] for v in value_ids
+        ])
+        rows.sort()
+        return rows.astype(np.int64)
+
+    def values_with_token(self, token, prefix=False):
+        """Distinct value ids containing the token (or a token starting with it)"""
+        if token in self._prefix_tokens or (prefix and any(t.startswith(token) for t in self._prefix_tokens)):
+            return np.arange(len(self.values))
+
+        lo = np.searchsorted(self.vocab, token, side='left')
+        if prefix:
+            hi = np.searchsorted(self.vocab, token + MAX_CHAR, side='left')
+        else:
+            hi = lo + 1 if lo < len(self.vocab) and self.vocab[lo] == token else lo
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(self._token_values[self._token_offsets[lo]:self._token_offsets[hi]])
+
+    def values_containing(self, query):
+        """Distinct value ids whose text contains the lowercase query as a substring"""
+        if self._trigrams is not None and len(query) >= 3 and VALUE_SEPARATOR not in query:
+            return self._trigrams.values_containing(query)
+        if not self.prefix:
+            return np.flatnonzero(self.values.str.contains(query, regex=False).values)
+        if query in self.prefix:
+            return np.arange(len(self.values))
+
+        # Stored values omit the shared prefix, so also match queries that straddle it
+        matches = self.values.str.contains(query, regex=False).values
+        for split in range(1, len(query)):
+            if self.prefix.endswith(query[:split]):
+                matches |= self.values.str.startswith(query[split:]).values
+        return np.flatnonzero(matches)
+
+    def rows_with_token(self, token, prefix=False):
+        """Sorted row ids where the column holds the token"""
+        return self.rows_for_values(self.values_with_token(token, prefix))
+
+    def rows_containing(self, query):
+        """Sorted row ids where the column contains the lowercase query"""
+        return self.rows_for_values(self.values_containing(query))
+
+class SearchIndex:
+    """Per-column indexes over the trademark table, built once at load time"""
+
+    MATCH_MODES = ('contains', 'word', 'prefix')
+
+    def __init__(self, df, link_prefix=''):
+        self.num_rows = len(df)
+        self.columns = {
+            col: ColumnIndex(
+                df[col],
+                prefix=link_prefix if col == 'Link' else '',
+                trigrams=col in TRIGRAM_COLUMNS
+            )
+            for col in df.columns
+        }
+        self.suggesters = {col: PrefixIndex(df[col]) for col in SUGGEST_COLUMNS if col in df.columns}
+        self.sorters = {col: SortPermutation(df[col]) for col in SORT_COLUMNS if col in df.columns}
+        self.classes = ClassIndex(df['Classes']) if 'Classes' in df.columns else None
+        if 'Owner' in df.columns:
+            self.owners = OwnerIndex(self.columns['Owner'], df['Date_sort'] if 'Date_sort' in df.columns else None)
+        else:
+            self.owners = None
+
+    def search(self, query, fields, match='contains'):
+        """Sorted row ids where any of the fields matches the query"""
+        if match not in self.MATCH_MODES:
+            raise ValueError(f"Unknown match mode '{match}'")
+
+        if match in ('word', 'prefix'):
+            tokens = tokenize(query)
+            if tokens:
+                return self._search_tokens(tokens, fields, prefix=match == 'prefix')
+
+        # Queries without word tokens fall back to a substring scan over distinct values
+        return self.scan(query.lower(), fields)
+
+    def _search_tokens(self, tokens, fields, prefix=False):
+        """Rows containing every token, each in any of the fields"""
+        result = None
+        for token in dict.fromkeys(tokens):
+            rows = union_rows(
+                [self.columns[field].rows_with_token(token, prefix) for field in fields],
+                self.num_rows
+            )
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result
+
+    def suggest(self, query, fields, limit=10):
+        """Most frequent values across the fields starting with the query"""
+        prefix = query.lower()
+        suggestions = [
+            {'value': value, 'field': field, 'count': count}
+            for field in fields if field in self.suggesters
+            for value, count in self.suggesters[field].complete(prefix, limit)
+        ]
+        suggestions.sort(key=lambda s: (-s['count'], s['value'].lower()))
+        return suggestions[:limit]
+
+    def scan(self, query, fields):
+        """Rows where any of the fields contains the lowercase query"""
+        return union_rows([self.columns[field].rows_containing(query) for field in fields], self.num_rows)
@@ -0,0 +1,163 @@
+import re
+import numpy as np
+import pandas as pd
+import Levenshtein
+
+# Symmetric delete search: marks and queries both index deletes up to this distance, which finds every
+# mark within this edit distance of the query (measured on the prefixes below), and is the largest
+# max_distance a search can ask for
+MAX_EDIT_DISTANCE = 2
+
+# Only the leading characters feed the deletion index, which bounds its size
+DELETE_PREFIX_LENGTH = 7
+
+# Most sound-alike candidates scored per query, so latency stays bounded for very common sounds
+MAX_CANDIDATES = 5000
+
+# Sound-alikes rank slightly below equally close spellings, and lose this many points per edit
+PHONETIC_WEIGHT = 0.9
+PHONETIC_EDIT_PENALTY = 5
+
+# Ordered rewrite rules for a simplified Metaphone key
+PHONETIC_RULES = [
+    (re.compile(r'^(kn|gn|pn|wr|ps)'), lambda m: m.group(0)[1]),
+    (re.compile(r'^x'), 's'),
+    (re.compile(r'x'), 'ks'),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'ck'), 'k'),
+    (re.compile(r'qu'), 'kw'),
+    (re.compile(r'q'), 'k'),
+    (re.compile(r'sch'), 'sk'),
+    (re.compile(r'(sh|ch)'), 'x'),
+    (re.compile(r'c(?=[eiy])'), 's'),
+    (re.compile(r'c'), 'k'),
+    (re.compile(r'dg(?=[eiy])'), 'j'),
+    (re.compile(r'gh(?![aeiou])'), ''),
+    (re.compile(r'gh'), 'g'),
+    (re.compile(r'g(?=[eiy])'), 'j'),
+    (re.compile(r'th'), '0'),
+    (re.compile(r'z'), 's'),
+    (re.compile(r'v'), 'f'),
+    (re.compile(r'[why](?![aeiou])'), ''),
+]
+
+def normalize_mark(mark):
+    """Lowercase a mark and keep only letters and digits"""
+    return re.sub(r'[\W_]+', '', str(mark).lower())
+
+def phonetic_key(normalized):
+    """Simplified Metaphone key of a normalized mark, e.g. KWIK and QUICK both give 'KWK'"""
+    key = normalized
+    for pattern, replacement in PHONETIC_RULES:
+        key = pattern.sub(replacement, key)
+    if not key:
+        return ''
+    # Keep a leading vowel as 'A', drop the rest, and collapse repeated sounds
+    key = ('a' if key[0] in 'aeiou' else key[0]) + re.sub(r'[aeiou]', '', key[1:])
+    return re.sub(r'(.)\1+', r'\1', key).upper()
+
+def deletes(term, distance):
+    """All strings reachable from term by deleting up to distance characters"""
+    results = {term}
+    frontier = {term}
+    for _ in range(distance):
+        frontier = {t[:i] + t[i + 1:] for t in frontier for i in range(len(t))}
+        results |= frontier
+    return results
+
+class SimilarityIndex:
+    """Near-spelling and sound-alike lookup over the distinct trademark words"""
+
+    def __init__(self, series):
+        counts = series.value_counts()
+        counts = counts[counts > 0]
+        frame = pd.DataFrame({'display': counts.index.astype(str), 'count': counts.values})
+        frame['normalized'] = frame['display'].map(normalize_mark)
+        frame = frame[frame['normalized'] != '']
+
+        # Marks differing only in case or punctuation are one entry, shown in their most frequent form
+        grouped = frame.groupby('normalized', sort=True).agg(display=('display', 'first'), count=('count', 'sum'))
+        self.marks = grouped.index.values.astype(object)
+        self.display = grouped['display'].values
+        self.counts = grouped['count'].values.astype(np.int64)
+        self.phonetic = np.array([phonetic_key(mark) for mark in self.marks], dtype=object)
+
+        self._build_phonetic_groups()
+        self._build_delete_index()
+
+    def _build_phonetic_groups(self):
+        """Group mark ids by phonetic key, sorted so a key's marks are contiguous"""
+        order = np.argsort(self.phonetic, kind='stable')
+        self._phonetic_order = order.astype(np.int32)
+        self._phonetic_sorted = self.phonetic[order]
+
+    def _build_delete_index(self):
+        """Hash every delete of every mark prefix, sorted for binary search"""
+        hashes = []
+        mark_ids = []
+        for mark_id, mark in enumerate(self.marks):
+            for variant in deletes(mark[:DELETE_PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+                hashes.append(hash(variant))
+                mark_ids.append(mark_id)
+        hashes = np.array(hashes, dtype=np.int64)
+        order = np.argsort(hashes, kind='stable')
+        self._delete_hashes = hashes[order]
+        self._delete_marks = np.array(mark_ids, dtype=np.int32)[order]
+
+    def _delete_candidates(self, normalized):
+        """Mark ids sharing a delete variant with the query prefix"""
+        variants = deletes(normalized[:DELETE_PREFIX_LENGTH], MAX_EDIT_DISTANCE)
+        query_hashes = np.array([hash(v) for v in variants], dtype=np.int64)
+        lo = np.searchsorted(self._delete_hashes, query_hashes, side='left')
+        hi = np.searchsorted(self._delete_hashes, query_hashes, side='right')
+        found = [self._delete_marks[a:b] for a, b in zip(lo, hi) if b > a]
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int32)
+
+    def _phonetic_candidates(self, key, length):
+        """Mark ids with the same phonetic key, closest in length first"""
+        lo = np.searchsorted(self._phonetic_sorted, key, side='left')
+        hi = np.searchsorted(self._phonetic_sorted, key, side='right')
+        ids = self._phonetic_order[lo:hi]
+        if len(ids) > MAX_CANDIDATES:
+            lengths = np.array([len(self.marks[i]) for i in ids])
+            ids = ids[np.argsort(np.abs(lengths - length), kind='stable')[:MAX_CANDIDATES]]
+        return ids
+
+    def find_similar(self, query, limit=20, max_distance=2, min_score=70):
+        """Rank marks that are spelled or sound like the query"""
+        normalized = normalize_mark(query)
+        if not normalized:
+            return []
+        key = phonetic_key(normalized)
+
+        spelled = self._delete_candidates(normalized)
+        # Close spellings are always scored; only the sound-alikes (closest in length first) are capped
+        sounds = self._phonetic_candidates(key, len(normalized)) if key else np.empty(0, dtype=np.int32)
+        candidates = np.union1d(spelled, sounds)
+
+        matches = []
+        for mark_id in candidates:
+            mark = self.marks[mark_id]
+            distance = Levenshtein.distance(normalized, mark)
+            sound_alike = bool(key) and self.phonetic[mark_id] == key
+            if distance > max_distance and not sound_alike:
+                continue
+
+            spelling_score = Levenshtein.ratio(normalized, mark) * 100
+            phonetic_score = Levenshtein.ratio(key, self.phonetic[mark_id]) * 100 if key else 0
+            # A shared sound is worth less the further apart the spellings are
+            score = max(spelling_score, PHONETIC_WEIGHT * phonetic_score - PHONETIC_EDIT_PENALTY * distance)
+            if score < min_score:
+                continue
+
+            matches.append({
+                'word': self.display[mark_id],
+                'score': round(score, 1),
+                'edit_distance': distance,
+                'sound_alike': sound_alike,
+                'phonetic_key': self.phonetic[mark_id],
+                'count': int(self.counts[mark_id])
+            })
+
+        matches.sort(key=lambda m: (-m['score'], -m['count'], m['word']))
+        return matches[:limit]
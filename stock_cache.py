@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# How long a writer waits on another process's lock before giving up (milliseconds)
+BUSY_TIMEOUT_MS = 5000
+
+class SQLiteStore:
+    """Base for the caches kept in SQLite (WAL mode), shared between threads and processes"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    def _connection(self):
+        """This thread's connection (sqlite3 connections must not be shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=BUSY_TIMEOUT_MS / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    def _select_in(self, sql, values, *params):
+        """Rows of sql run over values in batches, with '{values}' replaced by the placeholders"""
+        conn = self._connection()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(values), 500):
+            batch = values[start:start + 500]
+            yield from conn.execute(sql.format(values=','.join('?' * len(batch))), (*params, *batch))
+
+class StockCache(SQLiteStore):
+    """Stock data per ticker, upserted in batches"""
+
+    def __init__(self, db_path, legacy_json_path=None):
+        super().__init__(db_path)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stock_cache ("
+                "ticker TEXT PRIMARY KEY, data TEXT NOT NULL, timestamp TEXT NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        if legacy_json_path is not None:
+            self._migrate_json(legacy_json_path)
+
+    def _migrate_json(self, json_path):
+        """One-time import of the old stock_cache.json, recorded in cache_meta so it is not imported again"""
+        if not json_path.exists():
+            return
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM cache_meta WHERE key = 'migrated_json'").fetchone():
+            return
+        try:
+            with open(json_path, 'r') as f:
+                entries = json.load(f)
+            rows = [(ticker, json.dumps(entry['data']), entry['timestamp'])
+                    for ticker, entry in entries.items() if 'data' in entry and 'timestamp' in entry]
+            with conn:
+                # Entries already in the database are newer than the JSON file
+                conn.executemany("INSERT OR IGNORE INTO stock_cache VALUES (?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO cache_meta VALUES ('migrated_json', ?)",
+                             (datetime.now().isoformat(),))
+            print(f"✓ Migrated {len(rows)} cached tickers from {json_path.name}")
+        except Exception as e:
+            print(f"⚠ Could not migrate stock cache from {json_path}: {e}")
+
+    def get(self, ticker):
+        """(data, timestamp) for the ticker, or None"""
+        return self.get_many([ticker]).get(ticker)
+
+    def get_many(self, tickers):
+        """{ticker: (data, timestamp)} for the cached tickers among tickers"""
+        rows = self._select_in("SELECT ticker, data, timestamp FROM stock_cache WHERE ticker IN ({values})",
+                               list(dict.fromkeys(tickers)))
+        return {ticker: (json.loads(data), datetime.fromisoformat(timestamp)) for ticker, data, timestamp in rows}
+
+    def put_many(self, entries, timestamp=None):
+        """Upsert {ticker: data} in one transaction"""
+        if not entries:
+            return
+        timestamp = (timestamp or datetime.now()).isoformat()
+        rows = [(ticker, json.dumps(data), timestamp) for ticker, data in entries.items()]
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO stock_cache VALUES (?, ?, ?) "
+                "ON CONFLICT(ticker) DO UPDATE SET data = excluded.data, timestamp = excluded.timestamp",
+                rows
+            )
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM stock_cache").fetchone()[0]
+
+class ResolutionCache(SQLiteStore):
+    """Owner-to-ticker resolutions, stored per resolution version (a hash of everything they depend on)"""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS resolution_versions ("
+                "version TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, created TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS owner_resolutions ("
+                "version TEXT NOT NULL, owner TEXT NOT NULL, ticker TEXT, matched_key TEXT, score INTEGER, "
+                "status TEXT NOT NULL, PRIMARY KEY (version, owner))"
+            )
+
+    def register_version(self, version, fingerprint):
+        """Record the fingerprint behind a version, so later versions can be diffed against it"""
+        with self._connection() as conn:
+            conn.execute("INSERT OR IGNORE INTO resolution_versions VALUES (?, ?, ?)",
+                         (version, json.dumps(fingerprint), datetime.now().isoformat()))
+
+    def previous_version(self, version):
+        """(version, fingerprint) of the newest other version, or None"""
+        row = self._connection().execute(
+            "SELECT version, fingerprint FROM resolution_versions WHERE version != ? "
+            "ORDER BY created DESC LIMIT 1", (version,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def get_many(self, version, owners):
+        """{owner: resolution} for the owners resolved under this version"""
+        rows = self._select_in(
+            "SELECT owner, ticker, matched_key, score, status FROM owner_resolutions "
+            "WHERE version = ? AND owner IN ({values})",
+            list(dict.fromkeys(owners)), version
+        )
+        return {owner: {'ticker': ticker, 'matched_key': matched_key, 'score': score, 'status': status}
+                for owner, ticker, matched_key, score, status in rows}
+
+    def put_many(self, version, resolutions):
+        """Upsert {owner: resolution} for a version in one transaction"""
+        if not resolutions:
+            return
+        rows = [(version, owner, r['ticker'], r['matched_key'], r['score'], r['status'])
+                for owner, r in resolutions.items()]
+        with self._connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO owner_resolutions VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def prune(self, keep_versions):
+        """Drop every version (and its resolutions) not in keep_versions"""
+        keep = list(keep_versions)
+        placeholders = ','.join('?' * len(keep))
+        with self._connection() as conn:
+            conn.execute(f"DELETE FROM owner_resolutions WHERE version NOT IN ({placeholders})", keep)
+            conn.execute(f"DELETE FROM resolution_versions WHERE version NOT IN ({placeholders})", keep)
@@ -0,0 +1,135 @@
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+# Seconds between SSE keep-alive comments while a job has nothing new to report
+SSE_KEEPALIVE_SECONDS = 15
+
+# Finished jobs kept for polling and replay, oldest dropped first
+MAX_FINISHED_JOBS = 20
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+class StockAnalysisJob:
+    """One stock analysis run: its rows so far, status and cancel flag"""
+
+    def __init__(self, key, limit):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.limit = limit
+        self.status = 'queued'
+        self.rows = []
+        self.summary = None
+        self.error = None
+        self.created = datetime.now()
+        self.finished = None
+        self.cancelled = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def _update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._changed.notify_all()
+
+    def _add_row(self, row):
+        with self._changed:
+            self.rows.append(row)
+            self._changed.notify_all()
+
+    def to_dict(self, include_results=False):
+        """Job status for the polling endpoint"""
+        status = {
+            'job_id': self.id,
+            'status': self.status,
+            'limit': self.limit,
+            'rows': len(self.rows),
+            'created': self.created.isoformat(),
+            'finished': self.finished.isoformat() if self.finished else None,
+            'summary': self.summary,
+            'error': self.error
+        }
+        if include_results:
+            status['results'] = list(self.rows)
+        return status
+
+    def events(self, start=0):
+        """Server-Sent Events: one 'row' event per result from row start on, then the final status"""
+        position = start
+        while True:
+            with self._changed:
+                if position >= len(self.rows) and self.active:
+                    self._changed.wait(timeout=SSE_KEEPALIVE_SECONDS)
+                rows = self.rows[position:]
+                active = self.active
+            if rows:
+                for row in rows:
+                    yield f"id: {position}\nevent: row\ndata: {json.dumps(row)}\n\n"
+                    position += 1
+            elif active:
+                yield ": keep-alive\n\n"
+            if not active and position >= len(self.rows):
+                yield f"event: {self.status}\ndata: {json.dumps(self.to_dict())}\n\n"
+                return
+
+class StockJobManager:
+    """Runs stock analyses on background threads, sharing one run between identical requests"""
+
+    def __init__(self, stock_matcher, data_loader, summarize):
+        self.stock_matcher = stock_matcher
+        self.data_loader = data_loader
+        self.summarize = summarize
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, limit):
+        """Start an analysis, or return the identical one already running; returns (job, created)"""
+        key = (limit, self.data_loader.dataset_version)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.active and not job.cancelled.is_set():
+                    return job, False
+            job = StockAnalysisJob(key, limit)
+            self._jobs[job.id] = job
+            self._prune()
+        threading.Thread(target=self._run, args=(job,), name=f'stock-job-{job.id[:8]}', daemon=True).start()
+        return job, True
+
+    def get(self, job_id):
+        """The job with this id, or None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Ask a job to stop after the chunk it is working on; returns the job or None"""
+        job = self.get(job_id)
+        if job is not None and job.active:
+            job.cancelled.set()
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        job._update(status='running')
+        print(f"Starting stock analysis job {job.id} for top {job.limit} companies...")
+        try:
+            for row in self.stock_matcher.iter_company_analysis(self.data_loader.df, job.limit, job.cancelled):
+                job._add_row(row)
+            if job.cancelled.is_set():
+                job._update(status='cancelled', finished=datetime.now())
+                print(f"⚠ Stock analysis job {job.id} cancelled after {len(job.rows)} rows")
+            else:
+                job._update(status='done', summary=self.summarize(job.rows), finished=datetime.now())
+                print(f"✓ Stock analysis job {job.id} finished with {len(job.rows)} rows")
+        except Exception as e:
+            job._update(status='error', error=str(e), finished=datetime.now())
+            print(f"✗ Stock analysis job {job.id} failed: {e}")
@@ -1,10 +1,48 @@
 import pandas as pd
-import yfinance as yf
-from fuzzywuzzy import fuzz, process
+import numpy as np
+from fuzzywuzzy import utils as fuzz_utils
+from rapidfuzz.process import cdist
+from rapidfuzz.distance import Indel
+from candidate_index import CandidateIndex
+from term_automaton import TermAutomaton
+from market_data import QUOTE_FIELDS, MarketDataFetcher, create_provider, is_cacheable
+from stock_cache import ResolutionCache, StockCache
+from stock_refresh import StockRefresher
 import re
 import json
+import hashlib
 from datetime import datetime, timedelta
-import os
+
+# Owners scored per cdist call, bounding the score matrix held in memory
+FUZZY_BATCH_ROWS = 2048
+
+# Fuzzy scores at or above this skip the short-name and word-overlap checks
+HIGH_CONFIDENCE_SCORE = 95
+
+# Bump when normalize_company_name(s) or the matching rules change, so stored resolutions are redone
+NORMALIZER_VERSION = 1
+
+# Resolution statuses decided by fuzzy scores, which a newly added mapping key can change
+FUZZY_STATUSES = ('fuzzy', 'no_match', 'short_name', 'no_overlap')
+
+# Owners per market-data fetch while analyzing, so results can be streamed as they arrive
+ANALYSIS_CHUNK_OWNERS = 50
+
+# Terms that exclude a company on top of the blacklist
+BLACKLIST_KEYWORDS = ['music', 'entertainment', 'wrestling', 'films', 'records']
+
+# Automaton flags: an exception term wins over any blacklisted term
+ALLOW_FLAG = 1
+BLOCK_FLAG = 2
+
+NAME_PREFIXES = ['the ', 'a ', 'an ']
+
+NAME_SUFFIXES = ['inc', 'incorporated', 'corp', 'corporation', 'company', 'co', 'ltd', 'limited',
+                 'llc', 'technologies', 'technology', 'tech', 'systems', 'solutions',
+                 'enterprises', 'holdings', 'group', 'international', 'worldwide', 'global',
+                 'services', 'industries']
+
+SUFFIX_PATTERN = r'(?<!\S)(?:' + '|'.join(NAME_SUFFIXES) + r')(?!\S)'
 
 class CompanyMappings:
     """Manages company name to ticker mappings"""
@@ -563,6 +601,15 @@ class CompanyMappings:
             'geico': 'BRK-A', 'dairy queen': 'BRK-A', 'duracell': 'BRK-A',
         }
     
+    @staticmethod
+    def get_blacklist_exceptions():
+        """Return known entertainment companies that should be matched despite the blacklist"""
+        return {
+            'world wrestling entertainment', 'wwe', 'light & wonder', 'light and wonder',
+            'igt', 'mob entertainment', 'playn go', 'play n go', 'euro games technology',
+            'push gaming', 'disney', 'netflix', 'spotify', 'sony', 'warner', 'universal'
+        }
+    
     @staticmethod
     def get_company_blacklist():
         """Return companies that should be excluded from matching"""
@@ -582,33 +629,66 @@ class StockMatcher:
     
     def __init__(self, config):
         self.config = config
-        self.cache_file = config.stock_cache_path  # Use config path instead of hardcoded
-        self.stock_cache = self._load_cache()
+        self.stock_cache = StockCache(config.stock_cache_path, legacy_json_path=config.legacy_stock_cache_path)
+        self.resolution_cache = ResolutionCache(config.stock_cache_path)
+        self._resolution_versions = {}
+        self._resolutions = {}
         self.manual_mappings = CompanyMappings.get_manual_mappings()
         self.company_blacklist = CompanyMappings.get_company_blacklist()
+        self.blacklist_exceptions = CompanyMappings.get_blacklist_exceptions()
+        
+        # Exceptions and blacklisted terms checked together in one pass over each name
+        self._blacklist_automaton = TermAutomaton(
+            [(term, ALLOW_FLAG) for term in self.blacklist_exceptions] +
+            [(term, BLOCK_FLAG) for term in set(self.company_blacklist) | set(BLACKLIST_KEYWORDS)]
+        )
+        
+        self._prepare_mapping_keys()
+        
+        self.market_data = MarketDataFetcher(
+            create_provider(config),
+            max_workers=config.MARKET_DATA_WORKERS,
+            rate=config.MARKET_DATA_RATE,
+            burst=config.MARKET_DATA_BURST,
+            retries=config.MARKET_DATA_RETRIES,
+            backoff=config.MARKET_DATA_BACKOFF
+        )
+        self.quote_ttl = timedelta(minutes=config.STOCK_QUOTE_TTL_MINUTES)
+        self.quote_stale_limit = timedelta(hours=config.STOCK_QUOTE_STALE_HOURS)
+        self.profile_ttl = timedelta(hours=config.STOCK_PROFILE_TTL_HOURS)
+        self.invalid_ttl = timedelta(minutes=config.STOCK_INVALID_TTL_MINUTES)
+        self.refresher = StockRefresher(
+            self.market_data, self.stock_cache, self.quote_ttl,
+            interval=config.STOCK_REFRESH_INTERVAL_SECONDS,
+            hot_count=config.STOCK_REFRESH_HOT_TICKERS,
+            refresh_ahead=config.STOCK_REFRESH_AHEAD
+        )
         
         print(f"Loaded {len(self.manual_mappings)} manual company mappings")
         print(f"Loaded {len(self.company_blacklist)} blacklisted terms")
     
-    def _load_cache(self):
-        """Load stock data cache from file"""
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading cache: {e}")
-        return {}
+    def _prepare_mapping_keys(self):
+        """Pre-process mapping keys once for batch fuzzy scoring"""
+        self._mapping_keys = list(self.manual_mappings.keys())
+        self._mapping_sorted = [self._token_sort_form(key) for key in self._mapping_keys]
+        self._mapping_lengths = np.array([len(key) for key in self._mapping_sorted], dtype=np.int64)
+        self._candidate_index = CandidateIndex(self._mapping_sorted)
+        
+        # Word ids of every key, as key_id * vocabulary size + word_id codes for overlap checks
+        self._mapping_vocab = {}
+        key_ids, word_ids = [], []
+        for key_id, key in enumerate(self._mapping_keys):
+            for word in set(key.split()):
+                key_ids.append(key_id)
+                word_ids.append(self._mapping_vocab.setdefault(word, len(self._mapping_vocab)))
+        self._mapping_word_codes = np.unique(
+            np.array(key_ids, dtype=np.int64) * max(len(self._mapping_vocab), 1) + np.array(word_ids, dtype=np.int64)
+        )
     
-    def _save_cache(self):
-        """Save stock data cache to file"""
-        try:
-            # Ensure directory exists (though not needed in flat structure)
-            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.stock_cache, f)
-        except Exception as e:
-            print(f"Error saving cache: {e}")
+    @staticmethod
+    def _token_sort_form(text):
+        """String that fuzz.token_sort_ratio actually compares: processed, ASCII, tokens sorted"""
+        return ' '.join(sorted(fuzz_utils.full_process(text, force_ascii=True).split()))
     
     def normalize_company_name(self, name):
         """Normalize company name for matching"""
@@ -618,190 +698,440 @@ class StockMatcher:
         name = str(name).lower().strip()
         
         # Remove common prefixes
-        prefixes = ['the ', 'a ', 'an ']
-        for prefix in prefixes:
+        for prefix in NAME_PREFIXES:
             if name.startswith(prefix):
                 name = name[len(prefix):]
         
-        # Remove common suffixes
-        suffixes = ['inc', 'incorporated', 'corp', 'corporation', 'company', 'co', 'ltd', 'limited',
-                   'llc', 'technologies', 'technology', 'tech', 'systems', 'solutions',
-                   'enterprises', 'holdings', 'group', 'international', 'worldwide', 'global',
-                   'services', 'industries']
-        
         # Clean punctuation and normalize spaces
         name = re.sub(r'[^\w\s]', ' ', name)
         name = re.sub(r'\s+', ' ', name).strip()
         
-        # Remove suffixes
-        words = [word for word in name.split() if word not in suffixes]
+        # Remove common suffixes
+        words = [word for word in name.split() if word not in NAME_SUFFIXES]
         return ' '.join(words)
     
+    def normalize_company_names(self, names):
+        """normalize_company_name for many names at once, with pandas string operations"""
+        names = pd.Series(list(names), dtype=object)
+        missing = names.isna() | ~names.astype(bool)
+        names = names.where(~missing, '').astype(str).str.lower().str.strip()
+        
+        for prefix in NAME_PREFIXES:
+            names = names.where(~names.str.startswith(prefix), names.str[len(prefix):])
+        
+        names = names.str.replace(r'[^\w\s]', ' ', regex=True)
+        names = names.str.replace(r'\s+', ' ', regex=True).str.strip()
+        names = names.str.replace(SUFFIX_PATTERN, '', regex=True)
+        return names.str.replace(r'\s+', ' ', regex=True).str.strip().tolist()
+    
     def is_blacklisted_company(self, company_name):
         """Check if company should be excluded from matching"""
         normalized = self.normalize_company_name(company_name)
+        found = self._blacklist_automaton.scan(normalized, stop_flags=ALLOW_FLAG)
         
-        # Exception list for known entertainment companies that should be matched
-        known_entertainment_companies = {
-            'world wrestling entertainment', 'wwe', 'light & wonder', 'light and wonder',
-            'igt', 'mob entertainment', 'playn go', 'play n go', 'euro games technology',
-            'push gaming', 'disney', 'netflix', 'spotify', 'sony', 'warner', 'universal'
-        }
-        
-        # Check if it's a known entertainment company that should be matched
-        for known in known_entertainment_companies:
-            if known in normalized:
-                return False
-        
-        # Check against blacklist
-        for blacklisted in self.company_blacklist:
-            if blacklisted in normalized:
-                return True
-        
-        # Additional checks for specific patterns
-        if any(term in normalized for term in ['music', 'entertainment', 'wrestling', 'films', 'records']):
-            return True
-        
-        return False
+        # Known entertainment companies are matched even when a blacklisted term also appears
+        return bool(found & BLOCK_FLAG) and not found & ALLOW_FLAG
+    
+    def blacklisted_mask(self, normalized_names):
+        """is_blacklisted_company for many already-normalized names at once"""
+        found = self._blacklist_automaton.scan_many(normalized_names)
+        return ((found & BLOCK_FLAG) != 0) & ((found & ALLOW_FLAG) == 0)
     
     def find_ticker_by_fuzzy_match(self, company_name, threshold=85):
         """Find stock ticker using fuzzy matching"""
-        normalized_name = self.normalize_company_name(company_name)
-        if not normalized_name:
-            return None
+        match = self.resolve_tickers([company_name], threshold)[0]
         
-        # Check blacklist first
-        if self.is_blacklisted_company(company_name):
+        if match['status'] == 'blacklisted':
             print(f"Skipping blacklisted company: {company_name}")
-            return None
+        elif match['status'] == 'no_overlap':
+            print(f"Rejecting match: '{self.normalize_company_name(company_name)}' -> '{match['matched_key']}' "
+                  f"(score: {match['score']}, no significant word overlap)")
+        return match['ticker']
+    
+    def resolve_tickers(self, company_names, threshold=85, blocking=None):
+        """Resolve many company names to tickers in one pass
         
-        # Check exact matches first
-        if normalized_name in self.manual_mappings:
-            return self.manual_mappings[normalized_name]
+        Returns one dict per name with ticker, matched_key, score and status, where status is
+        'exact', 'fuzzy', 'blacklisted', 'short_name', 'no_overlap', 'no_match' or 'empty'.
+        """
+        normalized = self.normalize_company_names(company_names)
+        blacklisted = self.blacklisted_mask(normalized)
+        results = []
+        fuzzy_positions = []
+        for position, normalized_name in enumerate(normalized):
+            if not normalized_name:
+                results.append({'ticker': None, 'matched_key': None, 'score': None, 'status': 'empty'})
+            elif blacklisted[position]:
+                results.append({'ticker': None, 'matched_key': None, 'score': None, 'status': 'blacklisted'})
+            elif normalized_name in self.manual_mappings:
+                results.append({'ticker': self.manual_mappings[normalized_name], 'matched_key': normalized_name,
+                                'score': 100, 'status': 'exact'})
+            else:
+                results.append(None)
+                fuzzy_positions.append(position)
         
-        # Enhanced fuzzy matching with stricter criteria
-        match = process.extractOne(normalized_name, self.manual_mappings.keys(),
-                                 scorer=fuzz.token_sort_ratio, score_cutoff=threshold)
+        if not fuzzy_positions:
+            return results
         
-        if match:
-            matched_key, score = match
-            
-            # Additional validation: check if key words overlap
-            normalized_words = set(normalized_name.split())
-            matched_words = set(matched_key.split())
-            
-            # Require at least one significant word overlap (length > 2)
-            significant_overlap = any(
-                word in matched_words and len(word) > 2
-                for word in normalized_words
-            )
-            
-            # For very short company names, require higher similarity
-            if len(normalized_name.split()) <= 2 and score < 95:
-                return None
+        # Everything else is scored against every mapping key at once
+        queries = [normalized[position] for position in fuzzy_positions]
+        best_keys, best_scores = self._best_mapping_matches(queries, blocking)
+        overlaps = self._significant_overlaps(queries, best_keys)
+        
+        for position, query, key_id, score, overlap in zip(fuzzy_positions, queries, best_keys, best_scores, overlaps):
+            score = int(score)
+            matched_key = self._mapping_keys[key_id]
+            if score < threshold:
+                status = 'no_match'
+            elif len(query.split()) <= 2 and score < HIGH_CONFIDENCE_SCORE:
+                # For very short company names, require higher similarity
+                status = 'short_name'
+            elif score < HIGH_CONFIDENCE_SCORE and not overlap:
+                # Require word overlap for medium confidence matches
+                status = 'no_overlap'
+            else:
+                status = 'fuzzy'
             
-            # Require word overlap for medium confidence matches
-            if score < 95 and not significant_overlap:
-                print(f"Rejecting match: '{normalized_name}' -> '{matched_key}' (score: {score}, no significant word overlap)")
-                return None
+            results[position] = {
+                'ticker': self.manual_mappings[matched_key] if status == 'fuzzy' else None,
+                'matched_key': matched_key if status != 'no_match' else None,
+                'score': score,
+                'status': status
+            }
+        return results
+    
+    def _resolution_version(self, threshold):
+        """(version hash, fingerprint) of everything a resolution depends on"""
+        if threshold not in self._resolution_versions:
+            fingerprint = {
+                'normalizer': NORMALIZER_VERSION,
+                'threshold': threshold,
+                'high_confidence': HIGH_CONFIDENCE_SCORE,
+                'blacklist': sorted(set(self.company_blacklist) | set(BLACKLIST_KEYWORDS)),
+                'exceptions': sorted(self.blacklist_exceptions),
+                # Key order decides ties, so the mappings are kept as ordered pairs
+                'mappings': [[key, ticker] for key, ticker in self.manual_mappings.items()]
+            }
+            version = hashlib.sha256(json.dumps(fingerprint).encode()).hexdigest()[:16]
+            self._resolution_versions[threshold] = (version, fingerprint)
+        return self._resolution_versions[threshold]
+    
+    def cached_resolve_tickers(self, company_names, threshold=85):
+        """resolve_tickers with results stored per resolution version, so repeat runs are lookups
+        
+        After a mapping change only new owners and owners the change can affect are re-resolved.
+        """
+        owners = [str(name) for name in company_names]
+        version, fingerprint = self._resolution_version(threshold)
+        resolutions = self._resolutions.setdefault(version, {})
+        
+        missing = [owner for owner in dict.fromkeys(owners) if owner not in resolutions]
+        if missing:
+            resolutions.update(self.resolution_cache.get_many(version, missing))
+            missing = [owner for owner in missing if owner not in resolutions]
+        if missing:
+            carried = self._carried_over_resolutions(missing, version, fingerprint)
+            recompute = [owner for owner in missing if owner not in carried]
+            fresh = dict(zip(recompute, self.resolve_tickers(recompute, threshold))) if recompute else {}
             
-            return self.manual_mappings[matched_key]
+            self.resolution_cache.register_version(version, fingerprint)
+            self.resolution_cache.put_many(version, {**carried, **fresh})
+            previous = self.resolution_cache.previous_version(version)
+            self.resolution_cache.prune([version] + ([previous[0]] if previous else []))
+            resolutions.update(carried)
+            resolutions.update(fresh)
+            print(f"Resolved {len(missing)} new owners: {len(carried)} carried over, {len(fresh)} matched")
+        
+        return [dict(resolutions[owner]) for owner in owners]
+    
+    def _carried_over_resolutions(self, owners, version, fingerprint):
+        """Resolutions from the previous version that a mapping-only change cannot have affected"""
+        previous = self.resolution_cache.previous_version(version)
+        if previous is None:
+            return {}
+        previous_version, previous_fingerprint = previous
+        if any(previous_fingerprint[part] != fingerprint[part] for part in fingerprint if part != 'mappings'):
+            return {}
+        
+        old_mappings = dict(previous_fingerprint['mappings'])
+        new_mappings = self.manual_mappings
+        # Reordered keys can change which key wins a tie
+        if [key for key in old_mappings if key in new_mappings] != [key for key in new_mappings if key in old_mappings]:
+            return {}
+        
+        previous_resolutions = self.resolution_cache.get_many(previous_version, owners)
+        if not previous_resolutions:
+            return {}
         
-        return None
+        changed_keys = {key for key in old_mappings.keys() | new_mappings.keys()
+                        if old_mappings.get(key) != new_mappings.get(key)}
+        names = list(previous_resolutions)
+        resolutions = list(previous_resolutions.values())
+        normalized = self.normalize_company_names(names)
+        
+        # Owners whose own name or matched key was added, removed or re-pointed
+        affected = np.array([r['status'] != 'blacklisted' and (r['matched_key'] in changed_keys or n in changed_keys)
+                             for r, n in zip(resolutions, normalized)], dtype=bool)
+        
+        # Owners an added key would score at least as well as their previous best, or a removed key scored
+        # that well (no_match resolutions do not record which key was their best)
+        added_keys = [self._token_sort_form(key) for key in new_mappings if key not in old_mappings]
+        added_keys += [self._token_sort_form(key) for key in old_mappings if key not in new_mappings]
+        scored = np.array([i for i, r in enumerate(resolutions) if r['status'] in FUZZY_STATUSES and not affected[i]],
+                          dtype=np.int64)
+        if added_keys and len(scored):
+            queries = [self._token_sort_form(normalized[i]) for i in scored]
+            distances = cdist(queries, added_keys, scorer=Indel.distance, dtype=np.int64, workers=-1)
+            best = self._ratio_scores(
+                distances,
+                np.array([len(query) for query in queries], dtype=np.int64),
+                np.array([len(key) for key in added_keys], dtype=np.int64)
+            ).max(axis=1)
+            previous_scores = np.array([resolutions[i]['score'] for i in scored], dtype=np.int64)
+            affected[scored[best >= previous_scores]] = True
+        
+        return {name: resolution for name, resolution, hit in zip(names, resolutions, affected) if not hit}
+    
+    def _best_mapping_matches(self, queries, blocking=None):
+        """Best mapping key id and token_sort_ratio score for each query
+        
+        Scores reproduce fuzzywuzzy's token_sort_ratio (rounded Indel ratio of the sorted tokens), and
+        ties go to the first key, as process.extractOne would pick. With blocking, only keys sharing a
+        significant token or enough character n-grams with the query are scored.
+        """
+        if blocking is None:
+            blocking = len(self._mapping_keys) >= self.config.FUZZY_BLOCKING_MIN_KEYS
+        sorted_queries = [self._token_sort_form(query) for query in queries]
+        query_lengths = np.array([len(query) for query in sorted_queries], dtype=np.int64)
+        best_keys = np.zeros(len(queries), dtype=np.int64)
+        best_scores = np.zeros(len(queries), dtype=np.int64)
+        if not self._mapping_keys:
+            return best_keys, best_scores
+        
+        if blocking:
+            for i, query in enumerate(sorted_queries):
+                key_ids = self._candidate_index.candidates(query)
+                if len(key_ids) == 0:
+                    continue
+                distances = cdist([query], [self._mapping_sorted[k] for k in key_ids], scorer=Indel.distance,
+                                  dtype=np.int64)
+                scores = self._ratio_scores(distances, query_lengths[i:i + 1], self._mapping_lengths[key_ids])[0]
+                best_keys[i] = key_ids[scores.argmax()]
+                best_scores[i] = scores.max()
+            return best_keys, best_scores
+        
+        for start in range(0, len(queries), FUZZY_BATCH_ROWS):
+            end = start + FUZZY_BATCH_ROWS
+            distances = cdist(sorted_queries[start:end], self._mapping_sorted, scorer=Indel.distance,
+                              dtype=np.int64, workers=-1)
+            scores = self._ratio_scores(distances, query_lengths[start:end], self._mapping_lengths)
+            best_keys[start:end] = scores.argmax(axis=1)
+            best_scores[start:end] = scores.max(axis=1)
+        return best_keys, best_scores
+    
+    def blocking_recall_report(self, company_names, threshold=85):
+        """Compare blocked fuzzy matching against brute-force scoring of every mapping key"""
+        started = datetime.now()
+        brute_force = self.resolve_tickers(company_names, threshold, blocking=False)
+        brute_seconds = (datetime.now() - started).total_seconds()
+        started = datetime.now()
+        blocked = self.resolve_tickers(company_names, threshold, blocking=True)
+        blocked_seconds = (datetime.now() - started).total_seconds()
+        
+        # Recall: brute-force fuzzy candidates (score >= threshold) whose best score blocking also found
+        scored = [(full, fast) for full, fast in zip(brute_force, blocked)
+                  if full['status'] not in ('empty', 'blacklisted', 'exact')]
+        matched = [(full, fast) for full, fast in scored if full['status'] != 'no_match']
+        recalled = sum(1 for full, fast in matched if fast['score'] == full['score'])
+        candidate_counts = [
+            len(self._candidate_index.candidates(self._token_sort_form(self.normalize_company_name(name))))
+            for name, full in zip(company_names, brute_force)
+            if full['status'] not in ('empty', 'blacklisted', 'exact')
+        ]
+        return {
+            'owners': len(company_names),
+            'fuzzy_scored': len(scored),
+            'brute_force_matches': len(matched),
+            'recalled_matches': recalled,
+            'recall': recalled / len(matched) if matched else 1.0,
+            'same_ticker': sum(1 for full, fast in zip(brute_force, blocked) if full['ticker'] == fast['ticker']),
+            'mapping_keys': len(self._mapping_keys),
+            'avg_candidates': float(np.mean(candidate_counts)) if candidate_counts else 0.0,
+            'brute_force_seconds': brute_seconds,
+            'blocked_seconds': blocked_seconds
+        }
+    
+    @staticmethod
+    def _ratio_scores(distances, query_lengths, key_lengths):
+        """Rounded 0-100 Indel ratios from a query x key distance matrix"""
+        lengths = query_lengths[:, None] + key_lengths[None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.round(100 * ((lengths - distances) / lengths))
+        
+        # Empty strings score 0, as in fuzzywuzzy
+        scores[(query_lengths[:, None] == 0) | (key_lengths[None, :] == 0)] = 0
+        return scores
+    
+    def _significant_overlaps(self, queries, key_ids):
+        """Whether each query shares a word longer than 2 characters with its matched key"""
+        vocab_size = max(len(self._mapping_vocab), 1)
+        query_ids, word_ids = [], []
+        for query_id, query in enumerate(queries):
+            for word in set(query.split()):
+                if len(word) > 2 and word in self._mapping_vocab:
+                    query_ids.append(query_id)
+                    word_ids.append(self._mapping_vocab[word])
+        
+        query_ids = np.array(query_ids, dtype=np.int64)
+        codes = np.asarray(key_ids, dtype=np.int64)[query_ids] * vocab_size + np.array(word_ids, dtype=np.int64)
+        shared = np.isin(codes, self._mapping_word_codes)
+        return np.bincount(query_ids[shared], minlength=len(queries)) > 0
+    
+    def _servable_stock_info(self, tickers):
+        """Cached stock data that can be served now, and the served tickers that need a background refresh
+        
+        Quote fields are fresh for the quote TTL and served stale (flagged) up to the stale limit; past that
+        only the near-static profile fields are served, until the profile TTL runs out too. Tickers that
+        failed permanently are served as invalid for the (short) invalid TTL.
+        """
+        now = datetime.now()
+        served, stale = {}, []
+        for ticker, (data, cache_time) in self.stock_cache.get_many(tickers).items():
+            age = now - cache_time
+            if not data.get('valid', False):
+                if age < self.invalid_ttl:
+                    served[ticker] = data
+                continue
+            if age < self.quote_ttl:
+                served[ticker] = data
+                continue
+            if age >= self.profile_ttl:
+                continue
+            data = dict(data, stale=True)
+            if age >= self.quote_stale_limit:
+                data.update(dict.fromkeys(QUOTE_FIELDS))
+            served[ticker] = data
+            stale.append(ticker)
+        return served, stale
     
     def get_stock_info(self, ticker):
-        """Get stock information with caching"""
-        if ticker in self.stock_cache:
-            try:
-                cache_time = datetime.fromisoformat(self.stock_cache[ticker]['timestamp'])
-                if datetime.now() - cache_time < timedelta(hours=self.config.STOCK_CACHE_HOURS):
-                    return self.stock_cache[ticker]['data']
-            except Exception:
-                pass
-        
-        try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            stock_data = {
-                'ticker': ticker,
-                'name': info.get('longName', info.get('shortName', ticker)),
-                'price': info.get('currentPrice', info.get('regularMarketPrice')),
-                'market_cap': info.get('marketCap'),
-                'sector': info.get('sector'),
-                'industry': info.get('industry'),
-                'country': info.get('country'),
-                'exchange': info.get('exchange'),
-                'currency': info.get('currency', 'USD'),
-                'pe_ratio': info.get('forwardPE', info.get('trailingPE')),
-                'dividend_yield': info.get('dividendYield'),
-                'valid': True
-            }
-            self.stock_cache[ticker] = {'data': stock_data, 'timestamp': datetime.now().isoformat()}
-            self._save_cache()
-            return stock_data
-        except Exception as e:
-            print(f"Error fetching data for {ticker}: {e}")
-            return {'ticker': ticker, 'valid': False, 'error': str(e)}
+        """Get stock information with caching (stale entries are served and refreshed in the background)"""
+        self.refresher.record_hits([ticker])
+        served, stale = self._servable_stock_info([ticker])
+        if stale:
+            self.refresher.enqueue(stale)
+        if ticker in served:
+            return served[ticker]
+        
+        stock_data = self.market_data.fetch_one(ticker)
+        if is_cacheable(stock_data):
+            self.stock_cache.put_many({ticker: stock_data})
+        return stock_data
+    
+    def prefetch_stock_info(self, tickers):
+        """Stock data for every ticker: servable cache entries plus one concurrent fetch of the rest"""
+        tickers = list(dict.fromkeys(tickers))
+        self.refresher.record_hits(tickers)
+        results, stale = self._servable_stock_info(tickers)
+        missing = [ticker for ticker in tickers if ticker not in results]
+        if missing:
+            results.update(self._fetch_missing(missing))
+        if stale:
+            print(f"Serving {len(stale)} stale tickers while they refresh in the background")
+            self.refresher.enqueue(stale)
+        return results
+    
+    def _fetch_missing(self, missing):
+        """Fetch tickers with nothing servable in the cache concurrently and store the valid results"""
+        print(f"Fetching market data for {len(missing)} tickers ({self.market_data.provider.name})...")
+        started = datetime.now()
+        fetched = self.market_data.fetch_all(missing)
+        
+        # One upsert transaction for the whole batch, remembering permanent failures too
+        self.stock_cache.put_many({ticker: data for ticker, data in fetched.items() if is_cacheable(data)})
+        valid = [ticker for ticker, data in fetched.items() if data.get('valid', False)]
+        print(f"✓ Fetched {len(valid)}/{len(missing)} tickers in {(datetime.now() - started).total_seconds():.1f}s")
+        return fetched
     
     def analyze_trademark_companies(self, df, limit=500):
         """Analyze trademark companies for stock market presence"""
         if 'Owner' not in df.columns:
             return pd.DataFrame()
+        return pd.DataFrame(list(self.iter_company_analysis(df, limit)))
+    
+    def iter_company_analysis(self, df, limit=500, cancelled=None):
+        """Analysis rows for the top owners, yielded as each chunk's market data arrives
+        
+        Stops early (between chunks) once the cancelled event is set.
+        """
+        if 'Owner' not in df.columns:
+            return
         
         top_companies = df['Owner'].value_counts().head(limit)
-        results = []
         matches_found = 0
         rejected_matches = 0
         
         print(f"Analyzing top {len(top_companies)} companies for stock market presence...")
         
-        for i, (company, count) in enumerate(top_companies.items()):
-            if i % 50 == 0:
-                print(f"Progress: {i}/{len(top_companies)} ({i/len(top_companies)*100:.1f}%) - Found {matches_found} matches, rejected {rejected_matches}")
+        # Resolve every owner in one batch before fetching any market data
+        matches = self.cached_resolve_tickers(list(top_companies.index))
+        statuses = pd.Series([match['status'] for match in matches], dtype=object).value_counts().to_dict()
+        print(f"Resolved {len(matches)} owners: {statuses}")
+        
+        companies = list(top_companies.items())
+        for start in range(0, len(companies), ANALYSIS_CHUNK_OWNERS):
+            if cancelled is not None and cancelled.is_set():
+                print(f"Analysis cancelled after {start}/{len(companies)} companies")
+                return
+            print(f"Progress: {start}/{len(companies)} ({start/len(companies)*100:.1f}%) - Found {matches_found} matches, rejected {rejected_matches}")
             
-            ticker = self.find_ticker_by_fuzzy_match(company)
-            if ticker:
-                stock_info = self.get_stock_info(ticker)
-                if stock_info.get('valid', False):
-                    matches_found += 1
-                    confidence = 'High'
-                    
-                    # Determine confidence level
-                    normalized_company = self.normalize_company_name(company)
-                    if normalized_company in self.manual_mappings:
-                        confidence = 'Exact'
+            # Quotes for the chunk's resolved tickers are fetched concurrently
+            chunk_matches = matches[start:start + ANALYSIS_CHUNK_OWNERS]
+            fetched = self.prefetch_stock_info([match['ticker'] for match in chunk_matches if match['ticker']])
+            
+            for (company, count), match in zip(companies[start:start + ANALYSIS_CHUNK_OWNERS], chunk_matches):
+                ticker = match['ticker']
+                if ticker:
+                    stock_info = fetched.get(ticker) or self.get_stock_info(ticker)
+                    if stock_info.get('valid', False):
+                        matches_found += 1
+                        confidence = 'High'
+                        
+                        # Determine confidence level
+                        if match['status'] == 'exact':
+                            confidence = 'Exact'
+                        
+                        yield {
+                            'trademark_owner': str(company),
+                            'trademark_count': int(count),
+                            'ticker': str(ticker),
+                            'company_name': str(stock_info.get('name', '')),
+                            'current_price': float(stock_info.get('price', 0)) if stock_info.get('price') else None,
+                            'market_cap': int(stock_info.get('market_cap', 0)) if stock_info.get('market_cap') else None,
+                            'sector': str(stock_info.get('sector', '')) if stock_info.get('sector') else None,
+                            'industry': str(stock_info.get('industry', '')) if stock_info.get('industry') else None,
+                            'country': str(stock_info.get('country', '')) if stock_info.get('country') else None,
+                            'pe_ratio': float(stock_info.get('pe_ratio', 0)) if stock_info.get('pe_ratio') else None,
+                            'dividend_yield': float(stock_info.get('dividend_yield', 0)) if stock_info.get('dividend_yield') else None,
+                            'match_confidence': confidence
+                        }
+                else:
+                    if match['status'] == 'blacklisted':
+                        rejected_matches += 1
                     
-                    results.append({
+                    yield {
                         'trademark_owner': str(company),
                         'trademark_count': int(count),
-                        'ticker': str(ticker),
-                        'company_name': str(stock_info.get('name', '')),
-                        'current_price': float(stock_info.get('price', 0)) if stock_info.get('price') else None,
-                        'market_cap': int(stock_info.get('market_cap', 0)) if stock_info.get('market_cap') else None,
-                        'sector': str(stock_info.get('sector', '')) if stock_info.get('sector') else None,
-                        'industry': str(stock_info.get('industry', '')) if stock_info.get('industry') else None,
-                        'country': str(stock_info.get('country', '')) if stock_info.get('country') else None,
-                        'pe_ratio': float(stock_info.get('pe_ratio', 0)) if stock_info.get('pe_ratio') else None,
-                        'dividend_yield': float(stock_info.get('dividend_yield', 0)) if stock_info.get('dividend_yield') else None,
-                        'match_confidence': confidence
-                    })
-            else:
-                if self.is_blacklisted_company(company):
-                    rejected_matches += 1
-                
-                results.append({
-                    'trademark_owner': str(company),
-                    'trademark_count': int(count),
-                    'ticker': None, 'company_name': None, 'current_price': None,
-                    'market_cap': None, 'sector': None, 'industry': None,
-                    'country': None, 'pe_ratio': None, 'dividend_yield': None,
-                    'match_confidence': 'No Match'
-                })
-        
-        print(f"Analysis complete! Found {matches_found} public companies out of {len(results)} total.")
+                        'ticker': None, 'company_name': None, 'current_price': None,
+                        'market_cap': None, 'sector': None, 'industry': None,
+                        'country': None, 'pe_ratio': None, 'dividend_yield': None,
+                        'match_confidence': 'No Match'
+                    }
+        
+        print(f"Analysis complete! Found {matches_found} public companies out of {len(companies)} total.")
         print(f"Rejected {rejected_matches} potential false matches.")
-        print(f"Match rate: {matches_found/len(results)*100:.1f}%")
-        return pd.DataFrame(results)
+        if companies:
+            print(f"Match rate: {matches_found/len(companies)*100:.1f}%")
 
 # For backward compatibility, create an alias
 EnhancedStockMatcher = StockMatcher
\ No newline at end of file
@@ -0,0 +1,80 @@
+import threading
+from collections import Counter
+from datetime import datetime
+from market_data import is_cacheable
+
+class StockRefresher:
+    """Background refresh of stock data: queued stale tickers plus the hottest tickers shortly before they expire"""
+
+    def __init__(self, fetcher, cache, quote_ttl, interval=300, hot_count=100, refresh_ahead=0.8):
+        self.fetcher = fetcher
+        self.cache = cache
+        self.quote_ttl = quote_ttl
+        self.interval = interval
+        self.hot_count = hot_count
+        self.refresh_ahead = refresh_ahead
+        self._hits = Counter()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record_hits(self, tickers):
+        """Count lookups, so the scheduler knows which tickers are hot"""
+        with self._lock:
+            self._hits.update(tickers)
+        self._ensure_started()
+
+    def enqueue(self, tickers):
+        """Queue tickers for a refresh on the background thread (duplicates are merged)"""
+        with self._lock:
+            for ticker in tickers:
+                self._pending[ticker] = True
+        if self._pending:
+            self._ensure_started()
+            self._wake.set()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stock-refresh', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=self.interval)
+            self._wake.clear()
+            with self._lock:
+                queued = list(self._pending)
+                self._pending.clear()
+            tickers = list(dict.fromkeys(queued + self._expiring_hot_tickers()))
+            if tickers:
+                try:
+                    self.refresh(tickers)
+                except Exception as e:
+                    print(f"⚠ Background stock refresh failed: {e}")
+
+    def _expiring_hot_tickers(self):
+        """The most looked-up cached tickers whose quotes are close to (or past) their TTL"""
+        with self._lock:
+            hot = [ticker for ticker, _ in self._hits.most_common(self.hot_count)]
+        if not hot:
+            return []
+        due_age = self.quote_ttl * self.refresh_ahead
+        now = datetime.now()
+        return [ticker for ticker, (data, cache_time) in self.cache.get_many(hot).items()
+                if data.get('valid', False) and now - cache_time >= due_age]
+
+    def refresh(self, tickers):
+        """Fetch tickers now and upsert the results worth caching, returning how many were refreshed"""
+        fetched = self.fetcher.fetch_all(tickers)
+        updates = {ticker: data for ticker, data in fetched.items() if is_cacheable(data)}
+        # A failed refresh must not replace good data that is still being served while stale
+        failed = [ticker for ticker, data in updates.items() if not data.get('valid', False)]
+        for ticker, (data, _) in self.cache.get_many(failed).items():
+            if data.get('valid', False):
+                del updates[ticker]
+        self.cache.put_many(updates)
+        valid = sum(1 for data in fetched.values() if data.get('valid', False))
+        print(f"✓ Refreshed {valid}/{len(tickers)} tickers in the background")
+        return valid
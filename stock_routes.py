@@ -139,32 +139,55 @@ class StockRoutes:
                     analyzeButton.disabled = true;
                     analyzeButton.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Analyzing...';
 
-                    fetch(`/api/analyze-stocks?limit=${limit}`)
+                    // Start (or join) a background job and stream its rows as they resolve
+                    fetch('/api/analyze-stocks/jobs', {
+                        method: 'POST',
+                        headers: {'Content-Type': 'application/json'},
+                        body: JSON.stringify({limit: parseInt(limit)})
+                    })
                         .then(response => {
                             if (!response.ok) {
                                 throw new Error(`HTTP error! status: ${response.status}`);
                             }
                             return response.json();
                         })
-                        .then(data => {
-                            console.log('API Response:', data);
-                            loadingElement.style.display = 'none';
-                            analyzeButton.disabled = false;
-                            analyzeButton.innerHTML = '<i class="fas fa-search me-2"></i>Analyze Companies';
+                        .then(job => {
+                            allResults = [];
+                            const events = new EventSource(job.events_url);
 
-                            if (data.error) {
-                                alert('Error: ' + data.error);
-                                return;
-                            }
+                            events.addEventListener('row', event => {
+                                allResults.push(JSON.parse(event.data));
+                                analyzeButton.innerHTML = `<i class="fas fa-spinner fa-spin me-2"></i>Analyzing... ${allResults.length}/${job.limit}`;
+                            });
 
-                            if (data.results && data.results.length > 0) {
-                                allResults = data.results;
-                                displaySummary(data.summary);
-                                displayResults(allResults.filter(r => r.ticker));
-                                resultsElement.classList.remove('d-none');
-                            } else {
-                                alert('No results found. Check the console for errors.');
-                            }
+                            const finish = (event, message) => {
+                                events.close();
+                                loadingElement.style.display = 'none';
+                                analyzeButton.disabled = false;
+                                analyzeButton.innerHTML = '<i class="fas fa-search me-2"></i>Analyze Companies';
+                                if (message) {
+                                    alert(message);
+                                    return;
+                                }
+                                const status = JSON.parse(event.data);
+                                if (allResults.length > 0) {
+                                    displaySummary(status.summary);
+                                    displayResults(allResults.filter(r => r.ticker));
+                                    resultsElement.classList.remove('d-none');
+                                } else {
+                                    alert('No results found. Check the console for errors.');
+                                }
+                            };
+
+                            events.addEventListener('done', event => finish(event));
+                            events.addEventListener('cancelled', event => finish(event, 'Analysis was cancelled.'));
+                            events.addEventListener('error', event => {
+                                if (event.data) {
+                                    finish(event, 'Error: ' + JSON.parse(event.data).error);
+                                } else if (events.readyState === EventSource.CLOSED) {
+                                    finish(event, 'Lost connection to the analysis job.');
+                                }
+                            });
                         })
                         .catch(error => {
                             console.error('Fetch Error:', error);
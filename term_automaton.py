@@ -0,0 +1,96 @@
+from collections import deque
+import numpy as np
+
+# Texts stepped through the automaton together, bounding the padded code matrix
+SCAN_BATCH_ROWS = 16384
+
+class TermAutomaton:
+    """Aho-Corasick automaton over labelled terms, reporting which labels occur in a text in one pass
+
+    Each term carries a bit flag; scanning a text returns the OR of the flags of every term it contains.
+    """
+
+    def __init__(self, labelled_terms):
+        # Trie with output flags
+        goto = [{}]
+        flags = [0]
+        for term, flag in labelled_terms:
+            if not term:
+                continue
+            state = 0
+            for char in term:
+                if char not in goto[state]:
+                    goto.append({})
+                    flags.append(0)
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            flags[state] |= flag
+
+        # Breadth-first failure links, folded into a full transition function (a DFA)
+        alphabet = sorted({char for transitions in goto for char in transitions})
+        self._char_codes = {char: code for code, char in enumerate(alphabet, start=1)}
+        table = np.zeros((len(goto), len(alphabet) + 1), dtype=np.int32)
+        fail = [0] * len(goto)
+        queue = deque()
+        for char, child in goto[0].items():
+            table[0, self._char_codes[char]] = child
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            flags[state] |= flags[fail[state]]
+            table[state] = table[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = table[fail[state], self._char_codes[char]]
+                table[state, self._char_codes[char]] = child
+                queue.append(child)
+
+        self._alphabet_points = np.array([ord(char) for char in alphabet], dtype=np.uint32)
+        self._table = table
+        self._flags = np.array(flags, dtype=np.int64)
+        # Plain lists for the per-character scalar scan
+        self._rows = [dict((char, int(table[state, code])) for char, code in self._char_codes.items()
+                           if table[state, code]) for state in range(len(goto))]
+        self._flag_list = flags
+
+    def scan(self, text, stop_flags=0):
+        """OR of the flags of every term found in text (stops early once stop_flags are all seen)"""
+        state = 0
+        found = 0
+        rows, flags = self._rows, self._flag_list
+        for char in text:
+            state = rows[state].get(char, 0)
+            found |= flags[state]
+            if stop_flags and found & stop_flags == stop_flags:
+                break
+        return found
+
+    def scan_many(self, texts):
+        """Flags for every text at once, stepping all texts through the automaton together"""
+        texts = list(texts)
+        found = np.zeros(len(texts), dtype=np.int64)
+        for start in range(0, len(texts), SCAN_BATCH_ROWS):
+            codes = self._encode(texts[start:start + SCAN_BATCH_ROWS])
+            states = np.zeros(len(codes), dtype=np.int32)
+            batch_found = np.zeros(len(codes), dtype=np.int64)
+            for column in range(codes.shape[1]):
+                states = self._table[states, codes[:, column]]
+                batch_found |= self._flags[states]
+            found[start:start + len(codes)] = batch_found
+        return found
+
+    def _encode(self, texts):
+        """Texts as a zero-padded matrix of alphabet codes (0 for characters in no term)"""
+        lengths = np.array([len(text) for text in texts], dtype=np.int64)
+        points = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype=np.uint32)
+        if len(self._alphabet_points):
+            position = np.searchsorted(self._alphabet_points, points)
+            position = np.minimum(position, len(self._alphabet_points) - 1)
+            flat = np.where(self._alphabet_points[position] == points, position + 1, 0).astype(np.int32)
+        else:
+            flat = np.zeros(len(points), dtype=np.int32)
+
+        codes = np.zeros((len(texts), max(int(lengths.max()), 1)), dtype=np.int32)
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        columns = np.arange(len(points)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        codes[rows, columns] = flat
+        return codes